@@ -0,0 +1,473 @@
+"""Simulation kernels: the fixed-point iteration state <- activation(state @ W).
+
+The NumPy implementations always work; when Numba is installed the compiled
+equivalents are used instead. run_fcm and run_fcm_batch pick the available one.
+"""
+import math
+from typing import Tuple, Union
+
+import numpy as np
+from scipy import sparse
+
+# Numba is optional: when it's installed the iteration loop runs as compiled
+# code, otherwise the vectorized NumPy implementation is used
+try:
+    from numba import literally, njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# --- Activation Functions ---
+# Element-wise over whole state arrays (NumPy ufuncs); scalars work too.
+def sigmoid(x: np.ndarray) -> np.ndarray:
+    """Sigmoid activation function.
+
+    Uses exp(-|x|), which never overflows: 1 / (1 + e) for x >= 0 and
+    e / (1 + e) for x < 0.
+    """
+    e = np.exp(-np.abs(x))
+    return np.where(x >= 0, 1 / (1 + e), e / (1 + e))
+
+def sigmoid_cached(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sigmoid and its derivative s * (1 - s), sharing a single exp."""
+    value = sigmoid(x)
+    return value, value * (1 - value)
+
+def tanh(x: np.ndarray) -> np.ndarray:
+    """Hyperbolic tangent activation function."""
+    return np.tanh(x)
+
+def relu(x: np.ndarray) -> np.ndarray:
+    """ReLU activation function."""
+    return np.maximum(0.0, x)
+
+# Activation functions by id, as passed to the simulation kernels
+ACTIVATION_IDS = {"sigmoid": 0, "tanh": 1, "relu": 2}
+ACTIVATIONS = (sigmoid, tanh, relu)
+
+def _activate(act_id: int, x: np.ndarray, out: np.ndarray, scratch: np.ndarray, mask: np.ndarray) -> None:
+    """Write ACTIVATIONS[act_id](x) into out without allocating.
+
+    scratch (same shape and dtype as x) and mask (boolean, same shape) are
+    work buffers; x itself is left unchanged. The results match the
+    allocating functions above exactly, NaN included.
+    """
+    if act_id == 0:
+        # sigmoid: e = exp(-|x|), then 1 / (1 + e) for x >= 0 and e / (1 + e) otherwise
+        np.abs(x, out=scratch)
+        np.negative(scratch, out=scratch)
+        np.exp(scratch, out=scratch)
+        np.greater_equal(x, 0, out=mask)
+        np.add(scratch, 1, out=out)
+        np.divide(scratch, out, out=scratch)
+        np.divide(1, out, out=out, where=mask)
+        np.logical_not(mask, out=mask)
+        np.copyto(out, scratch, where=mask)
+    elif act_id == 1:
+        np.tanh(x, out=out)
+    else:
+        np.maximum(0.0, x, out=out)
+
+# --- Simulation Kernels ---
+# A run that never meets the convergence threshold may still have settled into
+# a limit cycle. Each step the new state is compared with the states 2 to
+# CYCLE_WINDOW steps back (1 step back is the convergence test itself), and the
+# run stops once every node is within CYCLE_TOLERANCE of one of them.
+#
+# Two guards keep runs that are still settling from being cut short when the
+# convergence threshold is small (down to 0):
+# - the tolerance shrinks to half the threshold when that is tighter, so a
+#   slowly damped oscillation only matches once it is within the threshold;
+# - the check only runs after a step that moved some node by more than
+#   CYCLE_TOLERANCE, so a state that stopped moving, or only jitters by float32
+#   rounding, is not taken for a period-2 cycle.
+CYCLE_WINDOW = 8
+CYCLE_TOLERANCE = 1e-6
+
+def _cycle_period(window: np.ndarray, state: np.ndarray, tolerance: float = CYCLE_TOLERANCE) -> np.ndarray:
+    """Period of the cycle state closes, or 0 if it closes none.
+
+    window holds the states 2 to CYCLE_WINDOW steps back, oldest first, with
+    the same trailing shape as state; for a batch, state is (runs, n) and the
+    result holds one period per run.
+    """
+    if window.shape[0] == 0:
+        return np.zeros(state.shape[:-1], dtype=np.int64)
+    hits = np.abs(window - state).max(axis=-1) <= tolerance
+    # The most recent match gives the shortest period
+    nearest = hits[::-1].argmax(axis=0)
+    return np.where(hits.any(axis=0), nearest + 2, 0)
+
+def _run_fcm_numpy(
+    W: np.ndarray,
+    s0: np.ndarray,
+    clamp_idx: np.ndarray,
+    clamp_vec: np.ndarray,
+    act_id: int,
+    threshold: float,
+    max_iter: int
+) -> Tuple[np.ndarray, int, bool, int]:
+    """Iterate state <- activation(state @ W) until the largest change drops below threshold.
+
+    The run also stops early when it enters a limit cycle (see CYCLE_WINDOW);
+    such a run is not reported as converged.
+
+    Args:
+        W: Adjacency matrix, W[i, j] being the weight of edge i -> j
+        s0: Initial state vector
+        clamp_idx: Indices of clamped nodes
+        clamp_vec: Values the clamped nodes are held at
+        act_id: Activation function id (see ACTIVATION_IDS)
+        threshold: Convergence threshold on the maximum absolute change
+        max_iter: Maximum number of iterations
+
+    Returns:
+        Tuple of (state history with one row per step including the initial
+        state, iterations performed, whether the run converged, period of the
+        detected cycle or 0)
+    """
+    history = np.empty((max_iter + 1, s0.shape[0]), dtype=s0.dtype)
+    history[0] = s0
+    state = history[0]
+    # Work buffers shared by all iterations. Each new state is computed
+    # straight into its history row, so no state is allocated or copied.
+    dense = not sparse.issparse(W)
+    weighted = np.empty_like(s0)
+    scratch = np.empty_like(s0)
+    mask = np.empty(s0.shape, dtype=np.bool_)
+    diff = np.empty_like(s0)
+    tolerance = min(CYCLE_TOLERANCE, threshold / 2)
+    iterations = 0
+    converged = False
+    cycle = 0
+    while not converged and not cycle and iterations < max_iter:
+        iterations += 1
+        new_state = history[iterations]
+        if dense:
+            np.matmul(state, W, out=weighted)
+        else:
+            weighted = state @ W
+        _activate(act_id, weighted, new_state, scratch, mask)
+        new_state[clamp_idx] = clamp_vec
+        np.subtract(new_state, state, out=diff)
+        np.abs(diff, out=diff)
+        moved = diff.argmax()  # the node that changed most (or the first NaN)
+        max_change = diff[moved]
+        if max_change < threshold:
+            converged = True
+        state = new_state
+        if not converged and max_change > CYCLE_TOLERANCE and iterations >= 2:
+            start = max(0, iterations - CYCLE_WINDOW)
+            # Full comparison only once the node that moved most is back near
+            # one of its earlier values, a necessary condition for any cycle
+            value = float(state[moved])
+            if any(abs(past - value) <= 2 * tolerance for past in history[start:iterations - 1, moved].tolist()):
+                cycle = int(_cycle_period(history[start:iterations - 1], state, tolerance))
+    return history[:iterations + 1], iterations, converged, cycle
+
+def _run_fcm_batch_numpy(
+    W: np.ndarray,
+    S0: np.ndarray,
+    clamp_mask: np.ndarray,
+    clamp_vals: np.ndarray,
+    act_id: int,
+    threshold: float,
+    max_iter: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Run several simulations over the same adjacency matrix at once.
+
+    Each row of S0 is an independent run; every step multiplies all runs that
+    are still active by W in one matrix product. A row stops updating once it
+    converges or enters a cycle, so each run behaves exactly as it would on its own.
+
+    Args:
+        W: Adjacency matrix, W[i, j] being the weight of edge i -> j
+        S0: Initial states, one row per run
+        clamp_mask: Boolean mask of clamped nodes, one row per run
+        clamp_vals: Values the masked nodes are held at, one row per run
+        act_id: Activation function id (see ACTIVATION_IDS)
+        threshold: Convergence threshold on the maximum absolute change
+        max_iter: Maximum number of iterations
+
+    Returns:
+        Tuple of (state history of shape (steps + 1, runs, n), iterations
+        performed per run, whether each run converged, period of each run's
+        detected cycle or 0). A run's own history is history[:iterations[run] + 1, run].
+    """
+    batch, n = S0.shape
+    history = np.empty((max_iter + 1, batch, n), dtype=S0.dtype)
+    history[0] = S0
+    state = S0.copy()
+    iterations = np.zeros(batch, dtype=np.int64)
+    converged = np.zeros(batch, dtype=np.bool_)
+    cycle = np.zeros(batch, dtype=np.int64)
+    # Work buffers shared by all steps; each step uses the first
+    # rows.size rows, one per run still active
+    dense = not sparse.issparse(W)
+    weighted_buffer = np.empty_like(S0)
+    new_buffer = np.empty_like(S0)
+    scratch_buffer = np.empty_like(S0)
+    mask_buffer = np.empty(S0.shape, dtype=np.bool_)
+    diff_buffer = np.empty_like(S0)
+    tolerance = min(CYCLE_TOLERANCE, threshold / 2)
+    rows = np.arange(batch)
+    step = 0
+    while step < max_iter and rows.size:
+        step += 1
+        active = rows.size
+        active_state = state[rows]
+        weighted = weighted_buffer[:active]
+        if dense:
+            np.matmul(active_state, W, out=weighted)
+        else:
+            weighted = active_state @ W
+        new_state = new_buffer[:active]
+        _activate(act_id, weighted, new_state, scratch_buffer[:active], mask_buffer[:active])
+        np.copyto(new_state, clamp_vals[rows], where=clamp_mask[rows])
+        diff = diff_buffer[:active]
+        np.subtract(new_state, active_state, out=diff)
+        np.abs(diff, out=diff)
+        run = np.arange(active)
+        moved = diff.argmax(axis=1)  # per run, the node that changed most (or the first NaN)
+        max_change = diff[run, moved]
+        state[rows] = new_state
+        history[step] = state
+        iterations[rows] = step
+        done = max_change < threshold
+        converged[rows] = done
+        if step >= 2:
+            # As in _run_fcm_numpy, only runs whose most-moved node is back near
+            # an earlier value get the full comparison
+            start = max(0, step - CYCLE_WINDOW)
+            past = history[start:step - 1, rows, moved]
+            near = (np.abs(past - new_state[run, moved]) <= 2 * tolerance).any(axis=0) & ~done & (max_change > CYCLE_TOLERANCE)
+            if near.any():
+                check = rows[near]
+                cycle[check] = _cycle_period(history[start:step - 1, check], new_state[near], tolerance)
+        rows = rows[~done & (cycle[rows] == 0)]
+    return history[:step + 1], iterations, converged, cycle
+
+# fastmath without 'nnan'/'ninf' so a diverging map still yields NaN/inf
+# rather than being reported as converged
+_FASTMATH_FLAGS = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, nogil=True)
+    def _cycle_period_compiled(history, step, tolerance):
+        """Compiled _cycle_period for one run's history, whose last row is history[step]."""
+        for lag in range(2, min(CYCLE_WINDOW, step) + 1):
+            matched = True
+            for i in range(history.shape[1]):
+                if not abs(history[step, i] - history[step - lag, i]) <= tolerance:
+                    matched = False
+                    break
+            if matched:
+                return lag
+        return 0
+
+    # The compiled kernels take sparse maps in CSC form (indptr, indices, data),
+    # where column i lists the incoming edges of node i, so each step costs
+    # O(edges) rather than O(n^2); denser maps come as a contiguous matrix whose
+    # inner loop vectorizes (see _CompiledFCM._adjacency_matrix). literally(act_id) compiles one
+    # specialization per activation with the other branches pruned, so the
+    # per-element activation dispatch disappears from the hot loop. They are
+    # only called through the per-activation entry points below: calling them
+    # from Python with a plain int would re-resolve the literal on every call.
+    @njit(cache=True, nogil=True, fastmath=_FASTMATH_FLAGS)
+    def _run_fcm_compiled(indptr, indices, data, Wt, s0, clamp_idx, clamp_vec, act_id, threshold, max_iter):
+        """Compiled equivalent of _run_fcm_numpy.
+
+        The adjacency is either CSC arrays, or, when Wt is non-empty, the dense
+        transposed matrix (row i holds node i's incoming weights).
+
+        Matmul, activation and the convergence test are fused into plain loops
+        over the state vector. The loops are serial on purpose: maps have tens
+        of nodes, where per-iteration thread start-up would cost more than it saves.
+        """
+        literally(act_id)
+        n = s0.shape[0]
+        dense = Wt.shape[0] > 0
+        clamped = np.zeros(n, dtype=np.bool_)
+        clamp_values = np.empty(n, dtype=s0.dtype)
+        for k in range(clamp_idx.shape[0]):
+            clamped[clamp_idx[k]] = True
+            clamp_values[clamp_idx[k]] = clamp_vec[k]
+        history = np.empty((max_iter + 1, n), dtype=s0.dtype)
+        history[0] = s0
+        state = s0.copy()
+        new_state = np.empty_like(s0)
+        tolerance = min(CYCLE_TOLERANCE, threshold / 2)
+        iterations = 0
+        converged = False
+        cycle = 0
+        while not converged and cycle == 0 and iterations < max_iter:
+            iterations += 1
+            # One pass computes each node's new value and folds its change into
+            # the running maximum, so the convergence test costs no extra sweep
+            max_change = 0.0
+            for i in range(n):
+                if clamped[i]:
+                    value = clamp_values[i]
+                else:
+                    acc = 0.0
+                    if dense:
+                        for j in range(n):
+                            acc += Wt[i, j] * state[j]
+                    else:
+                        for k in range(indptr[i], indptr[i + 1]):
+                            acc += data[k] * state[indices[k]]
+                    if act_id == 0:
+                        value = 1.0 / (1.0 + math.exp(-acc))
+                    elif act_id == 1:
+                        value = math.tanh(acc)
+                    else:
+                        value = 0.0 if acc < 0.0 else acc  # NaN passes through like np.maximum
+                new_state[i] = value
+                change = abs(new_state[i] - state[i])
+                if change > max_change or change != change:  # propagate NaN like np.max
+                    max_change = change
+            if max_change < threshold:
+                converged = True
+            state, new_state = new_state, state
+            history[iterations] = state
+            if not converged and max_change > CYCLE_TOLERANCE:
+                cycle = _cycle_period_compiled(history, iterations, tolerance)
+        return history[:iterations + 1], iterations, converged, cycle
+
+    @njit(cache=True, nogil=True, fastmath=_FASTMATH_FLAGS)
+    def _run_fcm_batch_compiled(indptr, indices, data, Wt, S0, clamp_mask, clamp_vals, act_id, threshold, max_iter):
+        """Compiled equivalent of _run_fcm_batch_numpy, with the adjacency as in _run_fcm_compiled.
+
+        Each adjacency column is loaded once per step and applied to every
+        active run, so W is streamed once for the whole batch.
+        """
+        literally(act_id)
+        batch, n = S0.shape
+        dense = Wt.shape[0] > 0
+        history = np.empty((max_iter + 1, batch, n), dtype=S0.dtype)
+        history[0] = S0
+        state = S0.copy()
+        new_state = np.empty_like(S0)
+        iterations = np.zeros(batch, dtype=np.int64)
+        converged = np.zeros(batch, dtype=np.bool_)
+        cycle = np.zeros(batch, dtype=np.int64)
+        step = 0
+        remaining = batch
+        max_change = np.zeros(batch, dtype=S0.dtype)
+        tolerance = min(CYCLE_TOLERANCE, threshold / 2)
+        while remaining > 0 and step < max_iter:
+            step += 1
+            max_change[:] = 0.0
+            for i in range(n):
+                for b in range(batch):
+                    if converged[b] or cycle[b]:
+                        continue
+                    if clamp_mask[b, i]:
+                        value = clamp_vals[b, i]
+                    else:
+                        acc = 0.0
+                        if dense:
+                            for j in range(n):
+                                acc += Wt[i, j] * state[b, j]
+                        else:
+                            for k in range(indptr[i], indptr[i + 1]):
+                                acc += data[k] * state[b, indices[k]]
+                        if act_id == 0:
+                            value = 1.0 / (1.0 + math.exp(-acc))
+                        elif act_id == 1:
+                            value = math.tanh(acc)
+                        else:
+                            value = 0.0 if acc < 0.0 else acc
+                    new_state[b, i] = value
+                    change = abs(new_state[b, i] - state[b, i])
+                    if change > max_change[b] or change != change:
+                        max_change[b] = change
+            for b in range(batch):
+                if converged[b] or cycle[b]:
+                    continue
+                for i in range(n):
+                    state[b, i] = new_state[b, i]
+                iterations[b] = step
+                if max_change[b] < threshold:
+                    converged[b] = True
+                    remaining -= 1
+            history[step] = state
+            for b in range(batch):
+                if converged[b] or cycle[b] or not max_change[b] > CYCLE_TOLERANCE:
+                    continue
+                cycle[b] = _cycle_period_compiled(history[:, b], step, tolerance)
+                if cycle[b]:
+                    remaining -= 1
+        return history[:step + 1], iterations, converged, cycle
+
+    _NO_CSC = (np.zeros(1, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32))
+    _NO_DENSE = np.zeros((0, 0), dtype=np.float32)
+
+    def _kernel_adjacency(
+        W: Union[np.ndarray, sparse.csc_array]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(indptr, indices, data, Wt) for the compiled kernels; the unused form is empty."""
+        if sparse.issparse(W):
+            return (
+                W.indptr.astype(np.intp, copy=False),
+                W.indices.astype(np.intp, copy=False),
+                W.data.astype(np.float32, copy=False),
+                _NO_DENSE
+            )
+        # The transpose of the column-major matrix is C-contiguous
+        return (*_NO_CSC, W.T)
+
+    # One entry point per activation passes act_id as a compile-time constant.
+    # Explicit signatures compile them (or load them from the on-disk cache)
+    # when the module is imported, so no request pays the JIT warm-up.
+    # nogil lets simulations from concurrent requests run on separate cores.
+    _RUN_FCM_SIGNATURES = [
+        "(intp[::1], intp[::1], float32[::1], float32[:, ::1], float32[::1], intp[::1], float32[::1], float64, int64)",
+    ]
+    _RUN_FCM_BATCH_SIGNATURES = [
+        "(intp[::1], intp[::1], float32[::1], float32[:, ::1], float32[:, ::1], boolean[:, ::1], float32[:, ::1], float64, int64)",
+    ]
+
+    @njit(_RUN_FCM_SIGNATURES, cache=True, nogil=True)
+    def _run_fcm_sigmoid(indptr, indices, data, Wt, s0, clamp_idx, clamp_vec, threshold, max_iter):
+        return _run_fcm_compiled(indptr, indices, data, Wt, s0, clamp_idx, clamp_vec, 0, threshold, max_iter)
+
+    @njit(_RUN_FCM_SIGNATURES, cache=True, nogil=True)
+    def _run_fcm_tanh(indptr, indices, data, Wt, s0, clamp_idx, clamp_vec, threshold, max_iter):
+        return _run_fcm_compiled(indptr, indices, data, Wt, s0, clamp_idx, clamp_vec, 1, threshold, max_iter)
+
+    @njit(_RUN_FCM_SIGNATURES, cache=True, nogil=True)
+    def _run_fcm_relu(indptr, indices, data, Wt, s0, clamp_idx, clamp_vec, threshold, max_iter):
+        return _run_fcm_compiled(indptr, indices, data, Wt, s0, clamp_idx, clamp_vec, 2, threshold, max_iter)
+
+    @njit(_RUN_FCM_BATCH_SIGNATURES, cache=True, nogil=True)
+    def _run_fcm_batch_sigmoid(indptr, indices, data, Wt, S0, clamp_mask, clamp_vals, threshold, max_iter):
+        return _run_fcm_batch_compiled(indptr, indices, data, Wt, S0, clamp_mask, clamp_vals, 0, threshold, max_iter)
+
+    @njit(_RUN_FCM_BATCH_SIGNATURES, cache=True, nogil=True)
+    def _run_fcm_batch_tanh(indptr, indices, data, Wt, S0, clamp_mask, clamp_vals, threshold, max_iter):
+        return _run_fcm_batch_compiled(indptr, indices, data, Wt, S0, clamp_mask, clamp_vals, 1, threshold, max_iter)
+
+    @njit(_RUN_FCM_BATCH_SIGNATURES, cache=True, nogil=True)
+    def _run_fcm_batch_relu(indptr, indices, data, Wt, S0, clamp_mask, clamp_vals, threshold, max_iter):
+        return _run_fcm_batch_compiled(indptr, indices, data, Wt, S0, clamp_mask, clamp_vals, 2, threshold, max_iter)
+
+    # Entry points by activation id (see ACTIVATION_IDS)
+    _RUN_FCM_KERNELS = (_run_fcm_sigmoid, _run_fcm_tanh, _run_fcm_relu)
+    _RUN_FCM_BATCH_KERNELS = (_run_fcm_batch_sigmoid, _run_fcm_batch_tanh, _run_fcm_batch_relu)
+
+    # threshold and max_iter are cast to match the compiled signatures
+    def run_fcm(W, s0, clamp_idx, clamp_vec, act_id, threshold, max_iter):
+        """Compiled run_fcm; same arguments and results as _run_fcm_numpy."""
+        return _RUN_FCM_KERNELS[act_id](
+            *_kernel_adjacency(W), s0, clamp_idx, clamp_vec, float(threshold), int(max_iter)
+        )
+
+    def run_fcm_batch(W, S0, clamp_mask, clamp_vals, act_id, threshold, max_iter):
+        """Compiled run_fcm_batch; same arguments and results as _run_fcm_batch_numpy."""
+        return _RUN_FCM_BATCH_KERNELS[act_id](
+            *_kernel_adjacency(W), S0, clamp_mask, clamp_vals, float(threshold), int(max_iter)
+        )
+else:
+    run_fcm = _run_fcm_numpy
+    run_fcm_batch = _run_fcm_batch_numpy
@@ -1,37 +1,77 @@
 from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
 from simulate import run_simulation, run_baseline_scenario_comparison, normalize_input_data
-from export import generate_notebook, transform_json_for_python, model_to_excel, scenario_to_excel, analysis_to_excel
+from export import generate_notebook_json, transform_json_for_python, excel_export
 from typing import Dict, List, Union, TypedDict, Literal
 import json
 import os
 import traceback
 import io
 from datetime import datetime
-import nbformat
-from simulation_schema import SimulationInputSchema
+from simulation_schema import SimulationInputSchema, ExportRequestSchema
+from pydantic import ValidationError
 import logging
 
+# orjson decodes request bodies faster than the stdlib json behind request.json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+def _as_dict_validation_error(error: ValidationError) -> Exception:
+    """
+    Map a validation error from the raw JSON body to what the earlier
+    request.get_json() + SimulationInputSchema(**data) path raised, so
+    /api/simulate keeps its established error messages.
+
+    Unparseable JSON becomes the 400 from request.get_json(), a top-level
+    value that is not an object becomes the TypeError from ** unpacking, and
+    field errors are rendered with python-mode wording ("valid list" rather
+    than "valid array").
+    """
+    line_errors = error.errors()
+    if len(line_errors) == 1 and not line_errors[0]['loc']:
+        root = line_errors[0]
+        if root['type'] == 'json_invalid':
+            request.on_json_loading_failed(error)  # raises the 400, as request.get_json() does
+        if root['type'] == 'model_type':
+            return TypeError(
+                f"{SimulationInputSchema.__module__}.{SimulationInputSchema.__qualname__}() "
+                f"argument after ** must be a mapping, not {type(root['input']).__name__}"
+            )
+    return ValidationError.from_exception_data(
+        error.title,
+        [{key: line[key] for key in ('type', 'loc', 'input', 'ctx') if key in line} for line in line_errors],
+        input_type='python',
+    )
+
 @app.route('/api/simulate', methods=['POST'])
 def simulate():
     """Run FCM simulation with validated input."""
     try:
-        data = request.get_json()
-        logging.info("Received simulation request: %s", json.dumps(data, indent=2))
+        if not request.is_json:
+            request.on_json_loading_failed(None)  # 415, as request.get_json() raises
+        body = request.get_data(as_text=True)
+        logging.info("Received simulation request: %s", body)
 
-        # Validate and parse input using Pydantic schema
-        sim_input = SimulationInputSchema(**data)
+        # Parse and validate the raw body in one pass: pydantic-core decodes
+        # the JSON itself, without an intermediate dict from request.get_json()
+        try:
+            sim_input = SimulationInputSchema.model_validate_json(body)
+        except ValidationError as e:
+            raise _as_dict_validation_error(e) from None
         sim_input.log_unknown_fields()
 
-        # Extract both sets of initial values if present
-        model_initial_values = data.get('modelInitialValues', {})
-        scenario_initial_values = data.get('scenarioInitialValues', {})
+        # Extract both sets of initial values if present (extra fields)
+        extra_fields = sim_input.model_extra or {}
+        model_initial_values = extra_fields.get('modelInitialValues', {})
+        scenario_initial_values = extra_fields.get('scenarioInitialValues', {})
 
         # Prepare arguments for simulation logic
-        sim_args = sim_input.dict()
+        sim_args = sim_input.model_dump()
 
         # Run appropriate simulation based on compareToBaseline flag
         if sim_input.compareToBaseline:
@@ -235,8 +275,8 @@ def export_notebook():
         scenario_id_int = int(scenario_id) if scenario_id is not None else None
         comparison_scenario_id_int = int(comparison_scenario_id) if comparison_scenario_id is not None else None
         
-        # Generate notebook
-        notebook = generate_notebook(
+        # Generate notebook (serialized, reused for repeated identical exports)
+        notebook_json = generate_notebook_json(
             data=export_data, 
             export_type=export_type, 
             model_id=model_id_int, 
@@ -260,10 +300,6 @@ def export_notebook():
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"{export_type}_export_{timestamp}.ipynb"
         
-        # Convert notebook to proper format using nbformat
-        nb = nbformat.from_dict(notebook)
-        notebook_json = nbformat.writes(nb)
-        
         # Create a file-like object from the notebook JSON
         notebook_file = io.BytesIO(notebook_json.encode('utf-8'))
         notebook_file.seek(0)
@@ -284,27 +320,30 @@ def export_notebook():
             'message': str(e)
         }), 500
 
+# Trusted export path: only the request envelope (ExportRequestSchema) is
+# validated. `data` is forwarded by the Node server (server/routes.ts) and is
+# only read by the exporters, which tolerate missing fields, so it is handed
+# over as a plain dict with no per-node pydantic pass. Model-level validation
+# belongs on /api/simulate, where the values feed the simulation.
 @app.route('/api/export/excel', methods=['POST'])
 def export_excel():
     try:
-        data = request.json.get('data')
-        export_type = request.json.get('type')
-        file_name = request.json.get('fileName')
+        body = request.get_data(cache=False)
+        payload = orjson.loads(body) if orjson is not None else json.loads(body)
+
+        # Check the envelope up front: missing data or an unknown type is rejected
+        # here, before any workbook work starts
+        try:
+            export_request = ExportRequestSchema.model_validate(payload)
+        except ValidationError as e:
+            return jsonify({'error': 'Invalid export request', 'message': str(e)}), 400
+        file_name = export_request.fileName
         
         logging.info(f"[FILENAME DEBUG] Received fileName from request: {file_name}")
-        
-        if not data or not export_type:
-            return jsonify({'error': 'Missing required data'}), 400
 
-        # Convert model to Excel format
-        if export_type == 'model':
-            output = model_to_excel(data)
-        elif export_type == 'scenario':
-            output = scenario_to_excel(data)
-        elif export_type == 'analysis':
-            output = analysis_to_excel(data)
-        else:
-            return jsonify({'error': f'Invalid export type: {export_type}'}), 400
+        # Convert model to Excel format, writing straight into the response body
+        # (or reusing the workbook from an identical recent export)
+        output, digest = excel_export(export_request.data, export_request.type)
 
         # Ensure .xlsx extension
         filename = file_name if file_name else 'export'
@@ -313,13 +352,13 @@ def export_excel():
         
         logging.info(f"[FILENAME DEBUG] Using final filename: {filename}")
         
-        # Return Excel file
-        output.seek(0)
+        # Return Excel file (send_file closes it once it is sent)
         response = send_file(
             output,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
-            download_name=filename
+            download_name=filename,
+            etag=digest
         )
         logging.info(f"[FILENAME DEBUG] Response headers: {dict(response.headers)}")
         return response
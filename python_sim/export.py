@@ -2,15 +2,88 @@
 Export utilities for MettaModeler Python service.
 """
 import json
+import math
 import os
-from typing import Dict, List, Any, Optional, Union, Tuple
+import re
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Dict, List, Any, Optional, Union, Tuple
 from datetime import datetime
-import traceback
 import io
+import logging
+import numpy as np
 import pandas as pd
 import nbformat as nbf
 from nbformat.v4 import new_notebook, new_markdown_cell, new_code_cell
 
+# orjson is optional: when installed it replaces the stdlib encoder for the
+# large JSON blobs (JSON exports, cache keys)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Strings that int()/float() will accept, checked up front instead of via exceptions.
+# Like those, it allows surrounding whitespace, a sign and a bare leading or
+# trailing point (" 5", "+5", ".5", "5."); only digit-grouping underscores
+# ("1_000") are no longer converted.
+_NUMERIC_RE = re.compile(r'^\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*$')
+
+_ACTIVATION_FUNCTIONS = frozenset(('sigmoid', 'tanh', 'relu'))
+
+# Node fill colors used in the model notebook visualization, keyed by node type
+_NODE_TYPE_COLORS = {
+    'driver': '#e74c3c',
+    'output': '#2ecc71',
+}
+
+def _json_bytes(data: Any, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """Encode data as UTF-8 JSON, with orjson when available.
+
+    Falls back to the stdlib encoder for values orjson rejects (e.g. integers
+    wider than 64 bits), so both paths accept the same input; values neither
+    can encode raise TypeError. One output difference remains: orjson writes
+    NaN and Infinity as null, where the stdlib encoder writes NaN/Infinity
+    (which is not valid JSON).
+    """
+    if orjson is not None:
+        # datetimes and dataclasses are passed through (and so rejected) as the
+        # stdlib encoder would, rather than silently written as strings/objects
+        option = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+                  | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(data, option=option)
+        except TypeError:
+            pass
+    return json.dumps(data, indent=2 if indent else None, sort_keys=sort_keys).encode('utf-8')
+
+def _py_literal(value: Any) -> str:
+    """Render JSON-like data (dicts, lists and plain values) as a Python literal for notebook code.
+
+    repr() already gives valid source for strings, numbers, booleans and None,
+    except non-finite floats: it spells them nan/inf, which are undefined names
+    in the notebook. Those are written as float('nan') etc. instead; the element
+    walk only runs when the repr could contain one.
+    """
+    text = repr(value)
+    if 'nan' not in text and 'inf' not in text:
+        return text
+    if isinstance(value, list):
+        return '[' + ', '.join(_py_literal(item) for item in value) + ']'
+    if isinstance(value, dict):
+        return '{' + ', '.join(f"{_py_literal(key)}: {_py_literal(item)}" for key, item in value.items()) + '}'
+    if isinstance(value, float) and not math.isfinite(value):
+        return f"float('{value!r}')"
+    return text
+
 def transform_json_for_python(data):
     """
     Transform JSON data structure so it's compatible with Python.
@@ -34,552 +107,719 @@ def transform_json_for_python(data):
     elif data == "null" or data is None:
         return None
     elif isinstance(data, str):
-        # Try to convert to numeric types if it's a numeric string
-        try:
+        # Convert numeric strings to numbers; everything else (labels,
+        # descriptions) is rejected by the regex without raising. As before,
+        # only strings with a decimal point become floats, so "1e5" stays text.
+        if _NUMERIC_RE.match(data):
             if '.' in data:
                 return float(data)
-            else:
-                try:
-                    return int(data)
-                except ValueError:
-                    # Special case for activation functions
-                    if data.lower() in ['sigmoid', 'tanh', 'relu']:
-                        return data.lower()
-                    return data
-        except (ValueError, TypeError):
-            return data
+            if 'e' not in data and 'E' not in data:
+                return int(data)
+        # Special case for activation functions
+        lowered = data.lower()
+        if lowered in _ACTIVATION_FUNCTIONS:
+            return lowered
+        return data
     else:
         return data
 
-def generate_notebook(data: Dict, export_type: str, model_id: Optional[int] = None,
-                     scenario_id: Optional[int] = None, comparison_scenario_id: Optional[int] = None) -> Dict:
-    """Generate a Jupyter notebook with FCM model, scenario, or analysis data."""
-    # Create notebook structure
+_IMPORTS_SRC = "\n".join([
+    "import pandas as pd",
+    "import numpy as np",
+    "import matplotlib.pyplot as plt",
+    "import networkx as nx",
+    "import json",
+    "import seaborn as sns",
+    "from matplotlib.colors import LinearSegmentedColormap",
+    "",
+    "# Set plot style",
+    "plt.style.use('ggplot')",
+    "sns.set_context('talk')",
+    "plt.rcParams['figure.figsize'] = [12, 8]",
+    "plt.rcParams['figure.dpi'] = 100",
+    "",
+    "# Custom color maps",
+    "node_cmap = LinearSegmentedColormap.from_list('node_cmap', ['#3498db', '#2ecc71', '#e74c3c'])",
+    "edge_cmap = LinearSegmentedColormap.from_list('edge_cmap', ['#e74c3c', '#95a5a6', '#2ecc71'])"
+])
+
+# Model visualization and analysis code; everything after the precomputed literals is fixed
+_MODEL_VIZ_SRC = "\n".join([
+    "# Calculate layout: Kamada-Kawai is faster and cleaner for small/mid-sized maps,",
+    "# spring layout with extra spacing for large ones (NetworkX releases with the",
+    "# L-BFGS spring_layout from PR #7889 speed this path up as well)",
+    "if G.number_of_nodes() <= 150:",
+    "    pos = nx.kamada_kawai_layout(G, weight=None)",  # Weights may be negative, so ignore them as distances
+    "else:",
+    "    pos = nx.spring_layout(G, k=3, iterations=50, seed=42)",  # Increased spacing
+    "",
+    "# Create figure with a specific size",
+    "plt.figure(figsize=(16, 12))",
+    "",
+    "# Draw edges first (so they're behind nodes), one call per influence sign",
+    "for edgelist, color, widths in ((pos_edges, '#3498db', pos_widths),",
+    "                                (neg_edges, '#e74c3c', neg_widths)):",
+    "    if not edgelist:",
+    "        continue",
+    "    nx.draw_networkx_edges(G,",
+    "                          pos,",
+    "                          edgelist=[tuple(e) for e in edgelist],",
+    "                          edge_color=color,",
+    "                          width=widths,",
+    "                          arrowsize=30,",  # Increased arrow size
+    "                          arrowstyle='->',",
+    "                          connectionstyle='arc3,rad=0.3',",  # Increased curve
+    "                          alpha=0.8)",  # Increased opacity
+    "",
+    "# Draw nodes",
+    "nx.draw_networkx_nodes(G,",
+    "                      pos,",
+    "                      nodelist=node_ids,",
+    "                      node_color=node_colors,",
+    "                      node_size=node_sizes,",
+    "                      alpha=0.9)",
+    "",
+    "# Draw labels with increased font size and background",
+    "nx.draw_networkx_labels(G,",
+    "                       pos,",
+    "                       labels=id_to_label,",  # Use the label mapping
+    "                       font_size=14,",  # Increased font size
+    "                       font_weight='bold',",
+    "                       bbox={'facecolor': 'white',",
+    "                             'edgecolor': 'none',",
+    "                             'alpha': 0.8,",
+    "                             'pad': 8})",  # Increased padding
+    "",
+    "# Draw edge labels with weights",
+    "edge_labels = {}",
+    "for (u, v, d) in G.edges(data=True):",
+    "    weight = d.get('weight', 0)",
+    "    # Add + sign for positive weights",
+    "    edge_labels[(u, v)] = f'{weight:+.2f}'",
+    "",
+    "nx.draw_networkx_edge_labels(G,",
+    "                            pos,",
+    "                            edge_labels=edge_labels,",
+    "                            font_size=12,",
+    "                            font_weight='bold',",
+    "                            bbox={'facecolor': 'white',",
+    "                                  'edgecolor': 'none',",
+    "                                  'alpha': 0.8})",
+    "",
+    "plt.title(f\"FCM Model: {model_data.get('name', 'Untitled')}\", pad=20, fontsize=16)",
+    "plt.axis('off')",
+    "",
+    "# Add legend",
+    "legend_elements = [",
+    "    plt.Line2D([0], [0], color='#3498db', label='Positive Influence', linewidth=4),",
+    "    plt.Line2D([0], [0], color='#e74c3c', label='Negative Influence', linewidth=4),",
+    "    plt.scatter([0], [0], c='#e74c3c', s=200, label='Driver Node'),",
+    "    plt.scatter([0], [0], c='#2ecc71', s=200, label='Output Node'),",
+    "    plt.scatter([0], [0], c='#3498db', s=200, label='Regular Node')",
+    "]",
+    "plt.legend(handles=legend_elements, loc='center left', bbox_to_anchor=(1, 0.5))",
+    "",
+    "plt.tight_layout()",
+    "plt.show()",
+    "",
+    "# Print statistics using labels",
+    "print(f\"Model Name: {model_data.get('name', 'Untitled')}\")",
+    "print(f\"Description: {model_data.get('description', 'No description')}\")",
+    "print(f\"Number of nodes: {len(model_data.get('nodes', []))}\")",
+    "print(f\"Number of edges: {len(model_data.get('edges', []))}\")",
+    "",
+    "# Add network analysis function that uses labels",
+    "def analyze_fcm(G, id_to_label):",
+    "    metrics = {}",
+    "    ",
+    "    # Basic properties",
+    "    metrics['node_count'] = G.number_of_nodes()",
+    "    metrics['edge_count'] = G.number_of_edges()",
+    "    metrics['density'] = nx.density(G)",
+    "    metrics['is_connected'] = nx.is_weakly_connected(G)",
+    "    ",
+    "    # Check for cycles",
+    "    try:",
+    "        cycles = list(nx.simple_cycles(G))",
+    "        metrics['has_cycles'] = len(cycles) > 0",
+    "        metrics['cycle_count'] = len(cycles)",
+    "    except:",
+    "        metrics['has_cycles'] = 'Unknown'",
+    "        metrics['cycle_count'] = 'Unknown'",
+    "    ",
+    "    # Centrality measures with label mapping",
+    "    id_centrality = nx.degree_centrality(G)",
+    "    metrics['degree_centrality'] = {id_to_label[node]: value for node, value in id_centrality.items()}",
+    "    ",
+    "    id_in_centrality = nx.in_degree_centrality(G)",
+    "    metrics['in_degree_centrality'] = {id_to_label[node]: value for node, value in id_in_centrality.items()}",
+    "    ",
+    "    id_out_centrality = nx.out_degree_centrality(G)",
+    "    metrics['out_degree_centrality'] = {id_to_label[node]: value for node, value in id_out_centrality.items()}",
+    "    ",
+    "    try:",
+    "        id_betweenness = nx.betweenness_centrality(G)",
+    "        metrics['betweenness_centrality'] = {id_to_label[node]: value for node, value in id_betweenness.items()}",
+    "    except:",
+    "        metrics['betweenness_centrality'] = 'Failed to compute'",
+    "    ",
+    "    try:",
+    "        id_closeness = nx.closeness_centrality(G)",
+    "        metrics['closeness_centrality'] = {id_to_label[node]: value for node, value in id_closeness.items()}",
+    "    except:",
+    "        metrics['closeness_centrality'] = 'Failed to compute'",
+    "    ",
+    "    return metrics",
+    "",
+    "# Run network analysis with labels",
+    "network_metrics = analyze_fcm(G, id_to_label)",
+    "",
+    "# Print global metrics",
+    "print('\\n=== Global Network Metrics ===')",
+    "for k, v in network_metrics.items():",
+    "    if not isinstance(v, dict):",
+    "        print(f\"{k}: {v}\")",
+    "",
+    "# Process centrality metrics using labels",
+    "centrality_metrics = {}",
+    "for metric_name, values in network_metrics.items():",
+    "    if isinstance(values, dict):",
+    "        for node_label, value in values.items():",
+    "            if node_label not in centrality_metrics:",
+    "                centrality_metrics[node_label] = {}",
+    "            centrality_metrics[node_label][metric_name] = value",
+    "",
+    "# Create DataFrame with labels",
+    "centrality_df = pd.DataFrame.from_dict(centrality_metrics, orient='index')",
+    "centrality_df.index.name = 'Node'",
+    "centrality_df = centrality_df.reset_index()",
+    "",
+    "# Display table",
+    "display(centrality_df)",
+    "",
+    "# Visualize top nodes by centrality using labels",
+    "fig, axes = plt.subplots(2, 2, figsize=(14, 10))",
+    "axes = axes.flatten()",
+    "",
+    "metrics_to_plot = [col for col in centrality_df.columns if col != 'Node' and not isinstance(centrality_df[col].iloc[0], str)]",
+    "",
+    "for i, metric in enumerate(metrics_to_plot[:4]):",
+    "    top_nodes = centrality_df.sort_values(by=metric, ascending=False).head(5)",
+    "    sns.barplot(x='Node', y=metric, data=top_nodes, ax=axes[i])",
+    "    axes[i].set_title(f'Top 5 Nodes by {metric}')",
+    "    axes[i].set_xticklabels(axes[i].get_xticklabels(), rotation=45, ha='right')",
+    "",
+    "plt.tight_layout()",
+    "plt.show()"
+])
+
+def _export_src(export_type: str) -> str:
+    """Source of the cell that writes the loaded data back out as JSON."""
+    return "\n".join([
+        "# Export data as JSON",
+        "with open('export_data.json', 'w') as f:",
+        f"    json.dump({export_type}_data, f, indent=2)",
+        "",
+        "print('Data exported to export_data.json')"
+    ])
+
+def _start_notebook(export_type: str, data: Any) -> Any:
+    """Create a notebook with the title, timestamp, imports and data cells."""
     notebook = new_notebook()
     
     # Add title and timestamp
     notebook.cells.append(new_markdown_cell(f"# MettaModeler Export: {export_type.capitalize()}"))
     notebook.cells.append(new_markdown_cell(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"))
+    notebook.cells.append(new_code_cell(_IMPORTS_SRC))
     
-    # Add imports cell
-    imports = [
-        "import pandas as pd",
-        "import numpy as np", 
-        "import matplotlib.pyplot as plt",
-        "import networkx as nx",
-        "import json",
-        "import seaborn as sns",
-        "from matplotlib.colors import LinearSegmentedColormap",
-        "",
-        "# Set plot style",
-        "plt.style.use('ggplot')",
-        "sns.set_context('talk')",
-        "plt.rcParams['figure.figsize'] = [12, 8]",
-        "plt.rcParams['figure.dpi'] = 100",
-        "",
-        "# Custom color maps",
-        "node_cmap = LinearSegmentedColormap.from_list('node_cmap', ['#3498db', '#2ecc71', '#e74c3c'])",
-                    "edge_cmap = LinearSegmentedColormap.from_list('edge_cmap', ['#e74c3c', '#95a5a6', '#2ecc71'])"
-                ]
-    
-    notebook.cells.append(new_code_cell("\n".join(imports)))
-    
-    # Add data cell with properly formatted JSON, but only include necessary model data
-    if export_type == 'model':
-        raw_model_data = {
-            'name': data.get('name', 'Untitled'),
-            'description': data.get('description', ''),
-            'nodes': data.get('nodes', []),
-            'edges': data.get('edges', [])
-        }
-        # Transform the data to use proper Python types
-        model_data = transform_json_for_python(raw_model_data)
-    else:
-        # Transform the data to use proper Python types
-        model_data = transform_json_for_python(data)
-        
     data_cell = [
         f"# Load {export_type} data",
-        f"{export_type}_data = {json.dumps(model_data, indent=2)}",
+        f"{export_type}_data = {_py_literal(data)}",
         "",
         "# Display basic information",
         f"print(f\"Data type: {export_type}\")"
     ]
-    
     notebook.cells.append(new_code_cell("\n".join(data_cell)))
-    
-    # Add type-specific visualization cells
-    if export_type == 'model':
-        viz_code = [
-            "# Create NetworkX graph",
-            "G = nx.DiGraph()",
-            "",
-            "# Create mapping of node IDs to labels",
-            "id_to_label = {}",
-            "node_colors = []",
-            "node_sizes = []",
-            "",
-            "# Add nodes and collect node information",
-            "for node in model_data['nodes']:",
-            "    node_id = node['id']",
-            "    label = node.get('label', node_id)",  # Get label directly from node
-            "    id_to_label[node_id] = label",
-            "    G.add_node(node_id, label=label)",
-            "    node_type = node.get('type', 'regular')",
-            "    if node_type == 'driver':",
-            "        node_colors.append('#e74c3c')",
-            "    elif node_type == 'output':",
-            "        node_colors.append('#2ecc71')",
-            "    else:",
-            "        node_colors.append('#3498db')",
-            "    node_sizes.append(5000)",  # Increased node size for better visibility
-            "",
-            "# Add edges",
-            "edges_to_draw = []",
-            "edge_colors = []",
-            "edge_widths = []",
-            "for edge in model_data['edges']:",
-            "    source = edge['source']",
-            "    target = edge['target']",
-            "    weight = edge.get('weight', 0)",  # Get weight directly from edge
-            "    G.add_edge(source, target, weight=weight)",
-            "    edges_to_draw.append((source, target))",
-            "    edge_colors.append('#3498db' if weight >= 0 else '#e74c3c')",
-            "    edge_widths.append(abs(weight) * 4)",  # Scale width by weight
-            "",
-            "# Calculate layout with more space between nodes",
-            "pos = nx.spring_layout(G, k=3, iterations=50, seed=42)",  # Increased spacing
-            "",
-            "# Create figure with a specific size",
-            "plt.figure(figsize=(16, 12))",
-            "",
-            "# Draw edges first (so they're behind nodes)",
-            "for (u, v), color, width in zip(edges_to_draw, edge_colors, edge_widths):",
-            "    nx.draw_networkx_edges(G,",
-            "                          pos,",
-            "                          edgelist=[(u, v)],",
-            "                          edge_color=[color],",
-            "                          width=width,",
-            "                          arrowsize=30,",  # Increased arrow size
-            "                          arrowstyle='->',",
-            "                          connectionstyle='arc3,rad=0.3',",  # Increased curve
-            "                          alpha=0.8)",  # Increased opacity
-            "",
-            "# Draw nodes",
-            "nx.draw_networkx_nodes(G,",
-            "                      pos,",
-            "                      node_color=node_colors,",
-            "                      node_size=node_sizes,",
-            "                      alpha=0.9)",
-            "",
-            "# Draw labels with increased font size and background",
-            "nx.draw_networkx_labels(G,",
-            "                       pos,",
-            "                       labels=id_to_label,",  # Use the label mapping
-            "                       font_size=14,",  # Increased font size
-            "                       font_weight='bold',",
-            "                       bbox={'facecolor': 'white',",
-            "                             'edgecolor': 'none',",
-            "                             'alpha': 0.8,",
-            "                             'pad': 8})",  # Increased padding
-            "",
-            "# Draw edge labels with weights",
-            "edge_labels = {}",
-            "for (u, v, d) in G.edges(data=True):",
-            "    weight = d.get('weight', 0)",
-            "    # Add + sign for positive weights",
-            "    edge_labels[(u, v)] = f'{weight:+.2f}'",
-            "",
-            "nx.draw_networkx_edge_labels(G,",
-            "                            pos,",
-            "                            edge_labels=edge_labels,",
-            "                            font_size=12,",
-            "                            font_weight='bold',",
-            "                            bbox={'facecolor': 'white',",
-            "                                  'edgecolor': 'none',",
-            "                                  'alpha': 0.8})",
-            "",
-            "plt.title(f\"FCM Model: {model_data.get('name', 'Untitled')}\", pad=20, fontsize=16)",
-            "plt.axis('off')",
-            "",
-            "# Add legend",
-            "legend_elements = [",
-            "    plt.Line2D([0], [0], color='#3498db', label='Positive Influence', linewidth=4),",
-            "    plt.Line2D([0], [0], color='#e74c3c', label='Negative Influence', linewidth=4),",
-            "    plt.scatter([0], [0], c='#e74c3c', s=200, label='Driver Node'),",
-            "    plt.scatter([0], [0], c='#2ecc71', s=200, label='Output Node'),",
-            "    plt.scatter([0], [0], c='#3498db', s=200, label='Regular Node')",
-            "]",
-            "plt.legend(handles=legend_elements, loc='center left', bbox_to_anchor=(1, 0.5))",
-            "",
-            "plt.tight_layout()",
-            "plt.show()",
-            "",
-            "# Print statistics using labels",
-            "print(f\"Model Name: {model_data.get('name', 'Untitled')}\")",
-            "print(f\"Description: {model_data.get('description', 'No description')}\")",
-            "print(f\"Number of nodes: {len(model_data.get('nodes', []))}\")",
-            "print(f\"Number of edges: {len(model_data.get('edges', []))}\")",
-            "",
-            "# Add network analysis function that uses labels",
-            "def analyze_fcm(G, id_to_label):",
-            "    metrics = {}",
-            "    ",
-            "    # Basic properties",
-            "    metrics['node_count'] = G.number_of_nodes()",
-            "    metrics['edge_count'] = G.number_of_edges()",
-            "    metrics['density'] = nx.density(G)",
-            "    metrics['is_connected'] = nx.is_weakly_connected(G)",
-            "    ",
-            "    # Check for cycles",
-            "    try:",
-            "        cycles = list(nx.simple_cycles(G))",
-            "        metrics['has_cycles'] = len(cycles) > 0",
-            "        metrics['cycle_count'] = len(cycles)",
-            "    except:",
-            "        metrics['has_cycles'] = 'Unknown'",
-            "        metrics['cycle_count'] = 'Unknown'",
-            "    ",
-            "    # Centrality measures with label mapping",
-            "    id_centrality = nx.degree_centrality(G)",
-            "    metrics['degree_centrality'] = {id_to_label[node]: value for node, value in id_centrality.items()}",
-            "    ",
-            "    id_in_centrality = nx.in_degree_centrality(G)",
-            "    metrics['in_degree_centrality'] = {id_to_label[node]: value for node, value in id_in_centrality.items()}",
-            "    ",
-            "    id_out_centrality = nx.out_degree_centrality(G)",
-            "    metrics['out_degree_centrality'] = {id_to_label[node]: value for node, value in id_out_centrality.items()}",
-            "    ",
-            "    try:",
-            "        id_betweenness = nx.betweenness_centrality(G)",
-            "        metrics['betweenness_centrality'] = {id_to_label[node]: value for node, value in id_betweenness.items()}",
-            "    except:",
-            "        metrics['betweenness_centrality'] = 'Failed to compute'",
-            "    ",
-            "    try:",
-            "        id_closeness = nx.closeness_centrality(G)",
-            "        metrics['closeness_centrality'] = {id_to_label[node]: value for node, value in id_closeness.items()}",
-            "    except:",
-            "        metrics['closeness_centrality'] = 'Failed to compute'",
-            "    ",
-            "    return metrics",
-            "",
-            "# Run network analysis with labels",
-            "network_metrics = analyze_fcm(G, id_to_label)",
-            "",
-            "# Print global metrics",
-            "print('\\n=== Global Network Metrics ===')",
-            "for k, v in network_metrics.items():",
-            "    if not isinstance(v, dict):",
-            "        print(f\"{k}: {v}\")",
-            "",
-            "# Process centrality metrics using labels",
-            "centrality_metrics = {}",
-            "for metric_name, values in network_metrics.items():",
-            "    if isinstance(values, dict):",
-            "        for node_label, value in values.items():",
-            "            if node_label not in centrality_metrics:",
-            "                centrality_metrics[node_label] = {}",
-            "            centrality_metrics[node_label][metric_name] = value",
-            "",
-            "# Create DataFrame with labels",
-            "centrality_df = pd.DataFrame.from_dict(centrality_metrics, orient='index')",
-            "centrality_df.index.name = 'Node'",
-            "centrality_df = centrality_df.reset_index()",
-            "",
-            "# Display table",
-            "display(centrality_df)",
-            "",
-            "# Visualize top nodes by centrality using labels",
-            "fig, axes = plt.subplots(2, 2, figsize=(14, 10))",
-            "axes = axes.flatten()",
-            "",
-            "metrics_to_plot = [col for col in centrality_df.columns if col != 'Node' and not isinstance(centrality_df[col].iloc[0], str)]",
-            "",
-            "for i, metric in enumerate(metrics_to_plot[:4]):",
-            "    top_nodes = centrality_df.sort_values(by=metric, ascending=False).head(5)",
-            "    sns.barplot(x='Node', y=metric, data=top_nodes, ax=axes[i])",
-            "    axes[i].set_title(f'Top 5 Nodes by {metric}')",
-            "    axes[i].set_xticklabels(axes[i].get_xticklabels(), rotation=45, ha='right')",
-            "",
-            "plt.tight_layout()",
-            "plt.show()"
-        ]
-        
-        notebook.cells.append(new_code_cell("\n".join(viz_code)))
-    
-    # Add export cell
-    export_code = [
-        "# Export data as JSON",
-        "with open('export_data.json', 'w') as f:",
-        f"    json.dump({export_type}_data, f, indent=2)",
+    return notebook
+
+def _build_data_nb(export_type: str, data: Dict) -> Any:
+    """Build a notebook that loads and re-exports the data without extra visualization."""
+    # Transform the data to use proper Python types
+    notebook = _start_notebook(export_type, transform_json_for_python(data))
+    notebook.cells.append(new_code_cell(_export_src(export_type)))
+    return notebook
+
+def _build_model_nb(data: Dict, model_id: Optional[int] = None, scenario_id: Optional[int] = None,
+                    comparison_scenario_id: Optional[int] = None) -> Any:
+    """Build a model notebook with graph visualization and network analysis."""
+    # Only include the model data the notebook needs, transformed to proper Python types
+    model_data = transform_json_for_python({
+        'name': data.get('name', 'Untitled'),
+        'description': data.get('description', ''),
+        'nodes': data.get('nodes', []),
+        'edges': data.get('edges', [])
+    })
+    notebook = _start_notebook('model', model_data)
+
+    # Precompute everything the drawing code needs here, while the model is
+    # already in hand, and embed it as literals instead of looping in the notebook
+    node_ids = []
+    node_labels = []
+    node_colors = []
+    # A malformed model still exports: entries that are not objects are
+    # skipped, a missing id reads as '' and a non-numeric weight draws as 0
+    nodes = model_data['nodes'] if isinstance(model_data['nodes'], list) else []
+    edges = model_data['edges'] if isinstance(model_data['edges'], list) else []
+    for node in nodes:
+        if not isinstance(node, dict):
+            continue
+        node_id = node.get('id', '')
+        node_ids.append(node_id)
+        node_labels.append(node.get('label', node_id))
+        node_colors.append(_NODE_TYPE_COLORS.get(node.get('type', 'regular'), '#3498db'))
+    node_sizes = [5000] * len(node_ids)  # Increased node size for better visibility
+
+    weighted_edges = []
+    pos_edges, pos_widths = [], []
+    neg_edges, neg_widths = [], []
+    for edge in edges:
+        if not isinstance(edge, dict):
+            continue
+        source = edge.get('source', '')
+        target = edge.get('target', '')
+        weight = edge.get('weight') or 0
+        if not isinstance(weight, (int, float)):
+            weight = 0
+        weighted_edges.append([source, target, weight])
+        if weight >= 0:
+            pos_edges.append([source, target])
+            pos_widths.append(abs(weight) * 4)  # Scale width by weight
+        else:
+            neg_edges.append([source, target])
+            neg_widths.append(abs(weight) * 4)
+
+    viz_code = [
+        "# Precomputed node and edge drawing data",
+        f"node_ids = {_py_literal(node_ids)}",
+        f"node_labels = {_py_literal(node_labels)}",
+        f"node_colors = {_py_literal(node_colors)}",
+        f"node_sizes = {_py_literal(node_sizes)}",
+        f"weighted_edges = {_py_literal(weighted_edges)}",
+        f"pos_edges = {_py_literal(pos_edges)}",
+        f"pos_widths = {_py_literal(pos_widths)}",
+        f"neg_edges = {_py_literal(neg_edges)}",
+        f"neg_widths = {_py_literal(neg_widths)}",
+        "",
+        "# Create NetworkX graph",
+        "G = nx.DiGraph()",
+        "id_to_label = dict(zip(node_ids, node_labels))",
+        "G.add_nodes_from(node_ids)",
+        "nx.set_node_attributes(G, id_to_label, 'label')",
+        "G.add_weighted_edges_from(weighted_edges)",
         "",
-        "print('Data exported to export_data.json')"
     ]
-    
-    notebook.cells.append(new_code_cell("\n".join(export_code)))
-    
+    notebook.cells.append(new_code_cell("\n".join(viz_code) + "\n" + _MODEL_VIZ_SRC))
+    notebook.cells.append(new_code_cell(_export_src('model')))
     return notebook
 
-def model_to_excel(model):
-    """Convert model to Excel format with multiple sheets."""
-    try:
-        print(f"Processing model for Excel export: {model.get('name', 'Unnamed Model')}")
-        print(f"Model has {len(model.get('nodes', []))} nodes and {len(model.get('edges', []))} edges")
-        print(f"Model keys: {list(model.keys())}")
-    
-        # Create Excel writer object
+def _build_scenario_nb(data: Dict, model_id: Optional[int] = None, scenario_id: Optional[int] = None,
+                       comparison_scenario_id: Optional[int] = None) -> Any:
+    """Build a scenario notebook."""
+    return _build_data_nb('scenario', data)
+
+def _build_analysis_nb(data: Dict, model_id: Optional[int] = None, scenario_id: Optional[int] = None,
+                       comparison_scenario_id: Optional[int] = None) -> Any:
+    """Build an analysis notebook."""
+    return _build_data_nb('analysis', data)
+
+def _build_comparison_nb(data: Dict, model_id: Optional[int] = None, scenario_id: Optional[int] = None,
+                         comparison_scenario_id: Optional[int] = None) -> Any:
+    """Build a scenario comparison notebook."""
+    return _build_data_nb('comparison', data)
+
+_NOTEBOOK_BUILDERS = {
+    'model': _build_model_nb,
+    'scenario': _build_scenario_nb,
+    'analysis': _build_analysis_nb,
+    'comparison': _build_comparison_nb,
+}
+
+def generate_notebook(data: Dict, export_type: str, model_id: Optional[int] = None,
+                     scenario_id: Optional[int] = None, comparison_scenario_id: Optional[int] = None) -> Dict:
+    """Generate a Jupyter notebook with FCM model, scenario, or analysis data."""
+    builder = _NOTEBOOK_BUILDERS.get(export_type)
+    if builder is None:
+        return _build_data_nb(export_type, data)
+    return builder(data, model_id, scenario_id, comparison_scenario_id)
+
+# Serialized notebooks keyed by a digest of their inputs, most recently used last.
+# Only notebooks up to _NOTEBOOK_CACHE_MAX_ENTRY_CHARS are kept, which bounds the
+# cache at maxsize * entry size, as for _EXCEL_CACHE.
+_NOTEBOOK_CACHE: "OrderedDict[str, str]" = OrderedDict()
+_NOTEBOOK_CACHE_MAXSIZE = 64
+_NOTEBOOK_CACHE_MAX_ENTRY_CHARS = 2 * 1024 * 1024
+_NOTEBOOK_CACHE_LOCK = threading.Lock()
+
+def generate_notebook_json(data: Dict, export_type: str, model_id: Optional[int] = None,
+                           scenario_id: Optional[int] = None, comparison_scenario_id: Optional[int] = None) -> str:
+    """
+    Generate a notebook and return it serialized with nbformat, reusing the
+    result when the same inputs were exported recently.
+
+    The cache key is a digest of the full payload, so any change to the model
+    produces a new key and stale entries simply age out of the LRU. A cached
+    notebook keeps the "Generated" timestamp of its first build. Notebooks over
+    _NOTEBOOK_CACHE_MAX_ENTRY_CHARS are returned without being cached.
+
+    Args:
+        data: The data to export (model, scenario, or analysis)
+        export_type: Type of export ('model', 'scenario', 'analysis', 'comparison')
+        model_id: Optional model ID for reference
+        scenario_id: Optional scenario ID for reference
+        comparison_scenario_id: Optional comparison scenario ID for reference
+
+    Returns:
+        Notebook JSON as a string
+    """
+    payload = _json_bytes([export_type, model_id, scenario_id, comparison_scenario_id, data], sort_keys=True)
+    digest = hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    with _NOTEBOOK_CACHE_LOCK:
+        notebook_json = _NOTEBOOK_CACHE.get(digest)
+        if notebook_json is not None:
+            _NOTEBOOK_CACHE.move_to_end(digest)
+            return notebook_json
+
+    notebook = generate_notebook(data, export_type, model_id, scenario_id, comparison_scenario_id)
+    notebook_json = nbf.writes(nbf.from_dict(notebook))
+
+    if len(notebook_json) <= _NOTEBOOK_CACHE_MAX_ENTRY_CHARS:
+        with _NOTEBOOK_CACHE_LOCK:
+            _NOTEBOOK_CACHE[digest] = notebook_json
+            if len(_NOTEBOOK_CACHE) > _NOTEBOOK_CACHE_MAXSIZE:
+                _NOTEBOOK_CACHE.popitem(last=False)
+    return notebook_json
+
+def _write_sheets(sheets: List[Tuple[str, pd.DataFrame]], output: Optional[BinaryIO] = None) -> BinaryIO:
+    """
+    Write prebuilt DataFrames to a workbook in a single pass.
+
+    Args:
+        sheets: (sheet name, DataFrame) pairs in workbook order
+        output: Writable, seekable binary file to write the workbook into
+            (e.g. a SpooledTemporaryFile); a new in-memory buffer by default
+
+    Returns:
+        The file written to, positioned at the start
+    """
+    if output is None:
         output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Model Info Sheet
-            model_info = pd.DataFrame([{
-                'Name': model.get('name', ''),
-                'Description': model.get('description', ''),
-                'Created At': model.get('createdAt', ''),
-                'Updated At': model.get('updatedAt', ''),
-                'Node Count': len(model.get('nodes', [])),
-                'Edge Count': len(model.get('edges', []))
-            }])
-            model_info.to_excel(writer, sheet_name='Model Info', index=False)
-            print("Created Model Info sheet")
-
-            # Nodes Sheet
-            nodes_data = []
-            for node in model.get('nodes', []):
-                node_data = {
-                    'ID': node.get('id', ''),
-                    'Label': node.get('label', ''),
-                    'Type': node.get('type', 'regular'),
-                    'Description': node.get('description', ''),
-                    'Initial Value': node.get('initialValue', 0),
-                    'Activation Function': node.get('activationFunction', 'sigmoid')
-                }
-                nodes_data.append(node_data)
-            
-            nodes_df = pd.DataFrame(nodes_data)
-            nodes_df.to_excel(writer, sheet_name='Nodes', index=False)
-            print("Created Nodes sheet")
-
-            # Edges Sheet
-            edges_data = []
-            for edge in model.get('edges', []):
-                edge_data = {
-                    'Source': edge.get('source', ''),
-                    'Target': edge.get('target', ''),
-                    'Weight': edge.get('weight', 0),
-                    'Description': edge.get('description', '')
-                }
-                edges_data.append(edge_data)
-            
-            edges_df = pd.DataFrame(edges_data)
-            edges_df.to_excel(writer, sheet_name='Edges', index=False)
-            print("Created Edges sheet")
-
-        output.seek(0)  # Important: reset the pointer to the beginning of the buffer
-        return output.getvalue()
-    except Exception as e:
-        print(f"Error converting model to Excel: {str(e)}")
-        print(f"Traceback: {traceback.format_exc()}")
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        for sheet_name, df in sheets:
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    output.seek(0)  # Important: reset the pointer to the beginning of the buffer
+    return output
+
+def model_to_excel(model, output: Optional[BinaryIO] = None) -> BinaryIO:
+    """Convert model to Excel format with multiple sheets, written to output (in memory by default)."""
+    try:
+        nodes = model.get('nodes') or []
+        edges = model.get('edges') or []
+        name = model.get('name', '')
+
+        logger.debug("Processing model for Excel export: %s", name or 'Unnamed Model')
+        logger.debug("Model has %d nodes and %d edges", len(nodes), len(edges))
+
+        # Model Info Sheet
+        model_info = pd.DataFrame([{
+            'Name': name,
+            'Description': model.get('description', ''),
+            'Created At': model.get('createdAt', ''),
+            'Updated At': model.get('updatedAt', ''),
+            'Node Count': len(nodes),
+            'Edge Count': len(edges)
+        }])
+
+        # Nodes Sheet
+        nodes_df = pd.DataFrame({
+            'ID': [node.get('id', '') for node in nodes],
+            'Label': [node.get('label', '') for node in nodes],
+            'Type': [node.get('type', 'regular') for node in nodes],
+            'Description': [node.get('description', '') for node in nodes],
+            'Initial Value': [node.get('initialValue', 0) for node in nodes],
+            'Activation Function': [node.get('activationFunction', 'sigmoid') for node in nodes]
+        })
+
+        # Edges Sheet
+        edges_df = pd.DataFrame({
+            'Source': [edge.get('source', '') for edge in edges],
+            'Target': [edge.get('target', '') for edge in edges],
+            'Weight': [edge.get('weight', 0) for edge in edges],
+            'Description': [edge.get('description', '') for edge in edges]
+        })
+
+        output = _write_sheets([
+            ('Model Info', model_info),
+            ('Nodes', nodes_df),
+            ('Edges', edges_df)
+        ], output)
+        logger.debug("Created Model Info, Nodes and Edges sheets")
+        return output
+    except Exception:
+        logger.exception("Error converting model to Excel")
         raise
 
-def scenario_to_excel(scenario: Dict) -> bytes:
+def scenario_to_excel(scenario: Dict, output: Optional[BinaryIO] = None) -> BinaryIO:
     """
     Convert a scenario to Excel format.
     
     Args:
         scenario: The scenario to convert
+        output: Binary file to write the workbook into (see _write_sheets)
         
     Returns:
-        Excel file as bytes
+        Excel file positioned at the start (in memory unless output is given)
     """
-    import pandas as pd
-    import io
+    # Build every sheet first, then write them all in one pass
+    sheets: List[Tuple[str, pd.DataFrame]] = []
+
+    # Scenario info sheet
+    scenario_info = pd.DataFrame([
+        {"Property": "Name", "Value": scenario.get("name", "")},
+        {"Property": "Description", "Value": scenario.get("description", "")},
+        {"Property": "Model ID", "Value": scenario.get("modelId", "")},
+        {"Property": "Activation Function", "Value": scenario.get("activationFunction", "sigmoid")},
+        {"Property": "Threshold", "Value": scenario.get("threshold", 0.001)},
+        {"Property": "Max Iterations", "Value": scenario.get("maxIterations", 100)},
+    ])
+    sheets.append(("Scenario Info", scenario_info))
     
-    output = io.BytesIO()
+    # Initial node values
+    if "nodes" in scenario and scenario["nodes"]:
+        initial_values = []
+        for node in scenario["nodes"]:
+            node_data = node.get("data", {})
+            initial_values.append({
+                "Node ID": node.get("id", ""),
+                "Label": node_data.get("label", ""),
+                "Initial Value": node_data.get("value", 0),
+                "Type": node_data.get("type", ""),
+            })
+        
+        initial_df = pd.DataFrame(initial_values)
+        del initial_values
+        sheets.append(("Initial Values", initial_df))
     
-    # Create Excel writer
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        # Scenario info sheet
-        scenario_info = pd.DataFrame([
-            {"Property": "Name", "Value": scenario.get("name", "")},
-            {"Property": "Description", "Value": scenario.get("description", "")},
-            {"Property": "Model ID", "Value": scenario.get("modelId", "")},
-            {"Property": "Activation Function", "Value": scenario.get("activationFunction", "sigmoid")},
-            {"Property": "Threshold", "Value": scenario.get("threshold", 0.001)},
-            {"Property": "Max Iterations", "Value": scenario.get("maxIterations", 100)},
-        ])
-        scenario_info.to_excel(writer, sheet_name="Scenario Info", index=False)
+    # Simulation results
+    if "results" in scenario and scenario["results"]:
+        results = scenario["results"]
         
-        # Initial node values
-        if "nodes" in scenario and scenario["nodes"]:
-            initial_values = []
-            for node in scenario["nodes"]:
-                node_data = node.get("data", {})
-                initial_values.append({
-                    "Node ID": node.get("id", ""),
-                    "Label": node_data.get("label", ""),
-                    "Initial Value": node_data.get("value", 0),
-                    "Type": node_data.get("type", ""),
-                })
+        # Iterations, collected column-wise so no per-row dicts are kept around
+        if "iterations" in results and results["iterations"]:
+            iteration_col, node_id_col, value_col = [], [], []
+            for iter_num, iter_values in enumerate(results["iterations"], start=1):
+                for node_id, value in iter_values.items():
+                    iteration_col.append(iter_num)
+                    node_id_col.append(node_id)
+                    value_col.append(value)
             
-            initial_df = pd.DataFrame(initial_values)
-            initial_df.to_excel(writer, sheet_name="Initial Values", index=False)
+            if iteration_col:
+                iterations_df = pd.DataFrame({
+                    "Iteration": iteration_col,
+                    "Node ID": node_id_col,
+                    "Value": value_col
+                })
+                sheets.append(("Iterations", iterations_df))
+            del iteration_col, node_id_col, value_col
         
-        # Simulation results
-        if "results" in scenario and scenario["results"]:
-            results = scenario["results"]
-            
-            # Iterations
-            if "iterations" in results and results["iterations"]:
-                iterations_data = []
-                
-                # Convert iterations to a format suitable for Excel
-                for iter_num, iter_values in enumerate(results["iterations"]):
-                    for node_id, value in iter_values.items():
-                        iterations_data.append({
-                            "Iteration": iter_num + 1,
-                            "Node ID": node_id,
-                            "Value": value
-                        })
-                
-                if iterations_data:
-                    iterations_df = pd.DataFrame(iterations_data)
-                    iterations_df.to_excel(writer, sheet_name="Iterations", index=False)
-            
-            # Final values
-            if "finalValues" in results and results["finalValues"]:
-                final_values = []
-                for node_id, value in results["finalValues"].items():
-                    final_values.append({
-                        "Node ID": node_id,
-                        "Final Value": value
-                    })
-                
-                if final_values:
-                    final_df = pd.DataFrame(final_values)
-                    final_df.to_excel(writer, sheet_name="Final Values", index=False)
-            
-            # Convergence info
-            if "converged" in results or "iterations" in results:
-                convergence_info = pd.DataFrame([
-                    {"Property": "Converged", "Value": str(results.get("converged", False)).lower()},
-                    {"Property": "Iterations Required", "Value": len(results.get("iterations", []))},
-                    {"Property": "Delta", "Value": results.get("delta", 0)},
-                ])
-                convergence_info.to_excel(writer, sheet_name="Convergence", index=False)
+        # Final values
+        if "finalValues" in results and results["finalValues"]:
+            final_values = results["finalValues"]
+            final_df = pd.DataFrame({
+                "Node ID": list(final_values.keys()),
+                "Final Value": list(final_values.values())
+            })
+            sheets.append(("Final Values", final_df))
         
-        # If there's a baseline comparison in the scenario
-        if "baselineResults" in scenario and scenario["baselineResults"]:
-            baseline = scenario["baselineResults"]
-            
-            # Baseline final values
-            if "finalValues" in baseline and baseline["finalValues"]:
-                baseline_values = []
-                for node_id, value in baseline["finalValues"].items():
-                    baseline_values.append({
-                        "Node ID": node_id,
-                        "Baseline Value": value
-                    })
-                
-                if baseline_values:
-                    baseline_df = pd.DataFrame(baseline_values)
-                    baseline_df.to_excel(writer, sheet_name="Baseline Values", index=False)
+        # Convergence info
+        if "converged" in results or "iterations" in results:
+            convergence_df = pd.DataFrame([
+                {"Property": "Converged", "Value": str(results.get("converged", False)).lower()},
+                {"Property": "Iterations Required", "Value": len(results.get("iterations", []))},
+                {"Property": "Delta", "Value": results.get("delta", 0)},
+            ])
+            sheets.append(("Convergence", convergence_df))
+    
+    # If there's a baseline comparison in the scenario
+    if "baselineResults" in scenario and scenario["baselineResults"]:
+        baseline = scenario["baselineResults"]
+        
+        # Baseline final values
+        if "finalValues" in baseline and baseline["finalValues"]:
+            baseline_values = baseline["finalValues"]
+            baseline_df = pd.DataFrame({
+                "Node ID": list(baseline_values.keys()),
+                "Baseline Value": list(baseline_values.values())
+            })
+            sheets.append(("Baseline Values", baseline_df))
+        
+        # Delta comparison
+        if "finalValues" in baseline and "results" in scenario and "finalValues" in scenario["results"]:
+            results = scenario["results"]  # Ensure results is defined
+            baseline_final = baseline["finalValues"]
+            scenario_final = results["finalValues"]
             
-            # Delta comparison
-            if "finalValues" in baseline and "results" in scenario and "finalValues" in scenario["results"]:
-                results = scenario["results"]  # Ensure results is defined
-                baseline_final = baseline["finalValues"]
-                scenario_final = results["finalValues"]
-                
-                comparison = []
-                for node_id in set(baseline_final.keys()) | set(scenario_final.keys()):
-                    baseline_value = baseline_final.get(node_id, 0)
-                    scenario_value = scenario_final.get(node_id, 0)
-                    delta = scenario_value - baseline_value
-                    
-                    comparison.append({
-                        "Node ID": node_id,
-                        "Baseline Value": baseline_value,
-                        "Scenario Value": scenario_value,
-                        "Delta": delta,
-                        "Percent Change": (delta / baseline_value * 100) if baseline_value != 0 else float('inf')
-                    })
-                
-                if comparison:
-                    comparison_df = pd.DataFrame(comparison)
-                    comparison_df.to_excel(writer, sheet_name="Comparison", index=False)
+            # Align both runs on a shared node order and compute deltas as arrays
+            node_ids = sorted(set(baseline_final) | set(scenario_final))
+            if node_ids:
+                baseline_arr = np.fromiter((baseline_final.get(node_id, 0) for node_id in node_ids),
+                                           dtype=np.float64, count=len(node_ids))
+                scenario_arr = np.fromiter((scenario_final.get(node_id, 0) for node_id in node_ids),
+                                           dtype=np.float64, count=len(node_ids))
+                delta = scenario_arr - baseline_arr
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    percent_change = np.where(baseline_arr != 0, delta / baseline_arr * 100, np.inf)
+
+                comparison_df = pd.DataFrame({
+                    "Node ID": node_ids,
+                    "Baseline Value": baseline_arr,
+                    "Scenario Value": scenario_arr,
+                    "Delta": delta,
+                    "Percent Change": percent_change
+                })
+                sheets.append(("Comparison", comparison_df))
     
-    output.seek(0)
-    return output.getvalue()
+    return _write_sheets(sheets, output)
 
-def analysis_to_excel(analysis: Dict) -> bytes:
+def analysis_to_excel(analysis: Dict, output: Optional[BinaryIO] = None) -> BinaryIO:
     """
     Convert analysis data to Excel format.
     
     Args:
         analysis: The analysis data to convert
+        output: Binary file to write the workbook into (see _write_sheets)
         
     Returns:
-        Excel file as bytes
+        Excel file positioned at the start (in memory unless output is given)
     """
-    import pandas as pd
-    import io
+    # Build every sheet first, then write them all in one pass
+    sheets: List[Tuple[str, pd.DataFrame]] = []
+
+    # Basic metrics (non-dictionary values)
+    basic_metrics = {key: value for key, value in analysis.items() if not isinstance(value, dict)}
     
-    output = io.BytesIO()
+    if basic_metrics:
+        metrics_df = pd.DataFrame({
+            "Metric": list(basic_metrics.keys()),
+            "Value": list(basic_metrics.values())
+        })
+        sheets.append(("Network Metrics", metrics_df))
     
-    # Create Excel writer
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        # Basic metrics
-        basic_metrics = {}
-        
-        # Extract basic metrics (non-dictionary values)
-        for key, value in analysis.items():
-            if not isinstance(value, dict):
-                basic_metrics[key] = value
-        
-        if basic_metrics:
-            metrics_df = pd.DataFrame([
-                {"Metric": k, "Value": v} for k, v in basic_metrics.items()
-            ])
-            metrics_df.to_excel(writer, sheet_name="Network Metrics", index=False)
-        
-        # Process centrality metrics if available
-        for metric_name, metric_data in analysis.items():
-            if isinstance(metric_data, dict):
-                # Convert centrality dictionaries to dataframes
-                metric_df = pd.DataFrame([
-                    {"Node ID": node_id, f"{metric_name}": value} 
-                    for node_id, value in metric_data.items()
-                ])
-                
-                if not metric_df.empty:
-                    # Sanitize sheet name (remove spaces, special chars)
-                    sheet_name = metric_name.replace(' ', '_')[:31]  # Excel sheet names limited to 31 chars
-                    metric_df.to_excel(writer, sheet_name=sheet_name, index=False)
-        
-        # Create a combined centrality sheet
-        combined_centrality = {}
-        
-        for metric_name, metric_data in analysis.items():
-            if isinstance(metric_data, dict):
-                for node_id, value in metric_data.items():
-                    if node_id not in combined_centrality:
-                        combined_centrality[node_id] = {}
-                    combined_centrality[node_id][metric_name] = value
-        
-        if combined_centrality:
-            # Convert the combined centrality data to a dataframe
-            combined_rows = []
-            for node_id, metrics in combined_centrality.items():
-                row = {"Node ID": node_id}
-                row.update(metrics)
-                combined_rows.append(row)
-            
-            combined_df = pd.DataFrame(combined_rows)
-            combined_df.to_excel(writer, sheet_name="Centrality Metrics", index=False)
+    # Process centrality metrics if available
+    for metric_name, metric_data in analysis.items():
+        if isinstance(metric_data, dict) and metric_data:
+            # Convert centrality dictionaries to dataframes
+            metric_df = pd.DataFrame({
+                "Node ID": list(metric_data.keys()),
+                f"{metric_name}": list(metric_data.values())
+            })
+            # Sanitize sheet name (remove spaces, special chars)
+            sheet_name = metric_name.replace(' ', '_')[:31]  # Excel sheet names limited to 31 chars
+            sheets.append((sheet_name, metric_df))
+    
+    # Create a combined centrality sheet
+    combined_centrality = {}
     
+    for metric_name, metric_data in analysis.items():
+        if isinstance(metric_data, dict):
+            for node_id, value in metric_data.items():
+                if node_id not in combined_centrality:
+                    combined_centrality[node_id] = {"Node ID": node_id}
+                combined_centrality[node_id][metric_name] = value
+    
+    if combined_centrality:
+        combined_df = pd.DataFrame(list(combined_centrality.values()))
+        del combined_centrality
+        sheets.append(("Centrality Metrics", combined_df))
+    
+    return _write_sheets(sheets, output)
+
+def model_to_excel_bytes(model: Dict) -> bytes:
+    """Convert model to Excel format and return the workbook as bytes."""
+    return model_to_excel(model).getvalue()
+
+def scenario_to_excel_bytes(scenario: Dict) -> bytes:
+    """Convert a scenario to Excel format and return the workbook as bytes."""
+    return scenario_to_excel(scenario).getvalue()
+
+def analysis_to_excel_bytes(analysis: Dict) -> bytes:
+    """Convert analysis data to Excel format and return the workbook as bytes."""
+    return analysis_to_excel(analysis).getvalue()
+
+# Spooled export files larger than this spill from memory to a temporary file
+EXCEL_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+_EXCEL_WRITERS = {
+    'model': model_to_excel,
+    'scenario': scenario_to_excel,
+    'analysis': analysis_to_excel,
+}
+
+# Built workbooks keyed by a digest of their inputs, most recently used last.
+# Only workbooks up to _EXCEL_CACHE_MAX_ENTRY_BYTES are kept, which bounds the
+# cache at maxsize * entry size.
+_EXCEL_CACHE: "OrderedDict[str, bytes]" = OrderedDict()
+_EXCEL_CACHE_MAXSIZE = 32
+_EXCEL_CACHE_MAX_ENTRY_BYTES = 2 * 1024 * 1024
+_EXCEL_CACHE_LOCK = threading.Lock()
+
+def excel_export(data: Dict, export_type: str) -> Tuple[BinaryIO, str]:
+    """
+    Convert data to an Excel workbook, reusing the result when the same data
+    was exported recently.
+
+    The cache key is a digest of the full payload, as for
+    generate_notebook_json, so any change to the data produces a new key.
+    A hit is served from the cached bytes; a miss builds the workbook in a
+    SpooledTemporaryFile that spills to disk above EXCEL_SPOOL_MAX_SIZE.
+
+    Args:
+        data: The data to export (model, scenario, or analysis)
+        export_type: Type of export ('model', 'scenario', 'analysis')
+
+    Returns:
+        (workbook file positioned at the start, hex digest of the inputs);
+        the digest is stable across requests and suits an ETag
+    """
+    writer = _EXCEL_WRITERS.get(export_type)
+    if writer is None:
+        raise ValueError(f"Unsupported Excel export type: {export_type}")
+
+    payload = _json_bytes([export_type, data], sort_keys=True)
+    digest = hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    with _EXCEL_CACHE_LOCK:
+        workbook = _EXCEL_CACHE.get(digest)
+        if workbook is not None:
+            _EXCEL_CACHE.move_to_end(digest)
+            return io.BytesIO(workbook), digest
+
+    spool = tempfile.SpooledTemporaryFile(max_size=EXCEL_SPOOL_MAX_SIZE)
+    try:
+        output = writer(data, spool)
+    except Exception:
+        spool.close()  # release the buffer, or the temp file once it has spilled
+        raise
+    size = output.seek(0, io.SEEK_END)
     output.seek(0)
-    return output.getvalue()
+    if size <= _EXCEL_CACHE_MAX_ENTRY_BYTES:
+        workbook = output.read()
+        output.seek(0)
+        with _EXCEL_CACHE_LOCK:
+            _EXCEL_CACHE[digest] = workbook
+            if len(_EXCEL_CACHE) > _EXCEL_CACHE_MAXSIZE:
+                _EXCEL_CACHE.popitem(last=False)
+    return output, digest
 
 def export_to_json(data: Dict) -> bytes:
     """
@@ -593,7 +833,7 @@ def export_to_json(data: Dict) -> bytes:
     """
     # Transform data to ensure consistent Python boolean types
     transformed_data = transform_json_for_python(data)
-    return json.dumps(transformed_data, indent=2).encode('utf-8')
+    return _json_bytes(transformed_data, indent=True)
 
 def export_to_csv(data: Dict, export_type: str) -> bytes:
     """
@@ -611,4 +851,4 @@ def export_to_csv(data: Dict, export_type: str) -> bytes:
     
     # Simple stub for now - returns JSON instead of CSV
     # When CSV implementation is added, still use the transformed_data
-    return json.dumps(transformed_data, indent=2).encode('utf-8')
\ No newline at end of file
+    return _json_bytes(transformed_data, indent=True)
\ No newline at end of file
@@ -1,12 +1,16 @@
 import numpy as np
-import networkx as nx
+from scipy import sparse
 import json
 import traceback
 from typing import Dict, List, Literal, Optional, Tuple, Union, Any
 import pandas as pd
-import copy
 import logging
 from flask import current_app
+from _fcm_kernel import (
+    ACTIVATION_IDS, ACTIVATIONS, NUMBA_AVAILABLE, relu, run_fcm, run_fcm_batch, sigmoid, sigmoid_cached, tanh
+)
+
+logger = logging.getLogger(__name__)
 
 logging.basicConfig(level=logging.INFO)
 
@@ -50,7 +54,19 @@ def normalize_input_data(data: Any) -> Any:
             return normalize_node(data)
         return {k: normalize_input_data(v) for k, v in data.items()}
     elif isinstance(data, list):
-        return [normalize_input_data(item) for item in data]
+        # Node and edge lists make up most of a payload, so their items are
+        # dispatched here directly instead of through another recursive call
+        normalized = []
+        for item in data:
+            if isinstance(item, dict):
+                if 'source' in item and 'target' in item:
+                    normalized.append(normalize_edge(item))
+                    continue
+                if 'id' in item:
+                    normalized.append(normalize_node(item))
+                    continue
+            normalized.append(normalize_input_data(item))
+        return normalized
     elif data == "true" or data is True:
         return True
     elif data == "false" or data is False:
@@ -66,21 +82,73 @@ def normalize_input_data(data: Any) -> Any:
             return data
     return data
 
-# --- Activation Functions ---
-def sigmoid(x: float) -> float:
-    """Sigmoid activation function."""
-    return 1 / (1 + np.exp(-x))
+# --- Simulation ---
+# Maps with at most this fraction of non-zero weights use a sparse (CSC)
+# adjacency matrix, denser ones a dense one. The NumPy path additionally needs
+# SPARSE_MIN_NODES nodes, below which SciPy's per-call overhead outweighs the
+# skipped zeros; the compiled kernels have no such overhead.
+SPARSE_MIN_NODES = 500
+SPARSE_MAX_DENSITY = 0.1
+
+class _CompiledFCM:
+    """Index-based form of a map's structure, shared by every run over it.
+
+    Holds the node order, the node ID -> index map, node labels and the
+    adjacency matrix. Treated as read-only once built.
+    """
+
+    def __init__(self, node_labels: Dict[str, str], edges: List[Dict]):
+        """Index nodes (in node_labels order) and build the adjacency matrix from edges."""
+        self.node_labels = node_labels
+        self.node_ids = list(node_labels)
+        self.node_to_index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        
+        # Duplicate edges keep the last weight
+        logger.info("Indexing edges:")
+        weights: Dict[Tuple[int, int], float] = {}
+        debug = logger.isEnabledFor(logging.DEBUG)
+        for edge in edges:
+            source, target, weight = self._parse_edge(edge)
+            if debug:
+                logger.debug("Extracted values - source: %s, target: %s, weight: %s", source, target, weight)
+            if source in self.node_to_index and target in self.node_to_index:
+                weights[self.node_to_index[source], self.node_to_index[target]] = weight
+            else:
+                logger.warning("Skipping edge with invalid source or target: %s -> %s", source, target)
+        self.edge_count = len(weights)
+        self.W = self._adjacency_matrix(weights)
 
-def tanh(x: float) -> float:
-    """Hyperbolic tangent activation function."""
-    return np.tanh(x)
+    @staticmethod
+    def _parse_edge(edge: Dict) -> Tuple[str, str, float]:
+        """Extract source, target, weight from an edge dict."""
+        source = str(edge.get('source', ''))
+        target = str(edge.get('target', ''))
+        weight = float(edge.get('weight', 0.0))
+        return source, target, weight
 
-def relu(x: float) -> float:
-    """ReLU activation function."""
-    return max(0, x)
+    def _adjacency_matrix(self, weights: Dict[Tuple[int, int], float]) -> Union[np.ndarray, sparse.csc_array]:
+        """Build the weighted adjacency matrix from (source index, target index) -> weight."""
+        # adjacency_matrix[i, j] is the weight of edge i -> j, so the weighted
+        # input of every node is a single vector-matrix product. Sparse maps
+        # stay in CSC form (each node's incoming weights contiguous) so the
+        # kernels only touch actual edges; dense ones become a column-major
+        # matrix, whose contiguous columns beat the indexed gathers of CSC.
+        # float32 halves the bytes moved per iteration; node values are far
+        # coarser than float32 eps.
+        n = len(self.node_ids)
+        count = len(weights)
+        rows = np.fromiter((source for source, _ in weights), dtype=np.intp, count=count)
+        cols = np.fromiter((target for _, target in weights), dtype=np.intp, count=count)
+        data = np.fromiter(weights.values(), dtype=np.float32, count=count)
+        adjacency_matrix = sparse.csc_array((data, (rows, cols)), shape=(n, n), dtype=np.float32)
+        dense = count > SPARSE_MAX_DENSITY * n * n or (not NUMBA_AVAILABLE and n < SPARSE_MIN_NODES)
+        if dense:
+            adjacency_matrix = adjacency_matrix.toarray(order='F')
+        logger.debug("Adjacency matrix shape: %s, edges: %d", adjacency_matrix.shape, count)
+        return adjacency_matrix
 
 class FCMSimulator:
-    """Fuzzy Cognitive Map simulator using NumPy and NetworkX."""
+    """Fuzzy Cognitive Map simulator using NumPy."""
     
     def __init__(
         self, 
@@ -91,10 +159,10 @@ class FCMSimulator:
         max_iterations: int = 100
     ):
         """Initialize FCM simulator with nodes and edges."""
-        logging.info("Initializing FCM Simulator")
-        logging.info(f"Activation function: {activation_function}")
-        logging.info(f"Threshold: {threshold}")
-        logging.info(f"Max iterations: {max_iterations}")
+        logger.info("Initializing FCM Simulator")
+        logger.info("Activation function: %s", activation_function)
+        logger.info("Threshold: %s", threshold)
+        logger.info("Max iterations: %s", max_iterations)
         
         if not nodes:
             raise ValueError("No nodes provided for simulation")
@@ -115,47 +183,34 @@ class FCMSimulator:
             except (TypeError, ValueError):
                 raise ValueError(f"Invalid node value: {node_value}")
         
-        if activation_function == "sigmoid":
-            self.activation = sigmoid
-        elif activation_function == "tanh":
-            self.activation = tanh
-        elif activation_function == "relu":
-            self.activation = relu
-        else:
+        if activation_function not in ACTIVATION_IDS:
             raise ValueError(f"Unknown activation function: {activation_function}")
-        
-        self.graph = nx.DiGraph()
-        
-        logging.info("Adding nodes to graph:")
+        self.activation_id = ACTIVATION_IDS[activation_function]
+        self.activation = ACTIVATIONS[self.activation_id]
+        
+        # Duplicate node IDs keep their first position with the last value/label
+        logger.info("Indexing nodes:")
+        self.initial_state: Dict[str, float] = {}
+        node_labels: Dict[str, str] = {}
+        debug = logger.isEnabledFor(logging.DEBUG)
         for node in self.nodes:
             node_id, value, label = self._parse_node(node)
-            logging.debug(f"Extracted values - id: {node_id}, value: {value}, label: {label}")
-            self.graph.add_node(
-                node_id,
-                value=value,
-                label=label
-            )
-            logging.debug(f"Added node {node_id} to graph")
-        
-        logging.info("Adding edges to graph:")
-        for edge in self.edges:
-            source, target, weight = self._parse_edge(edge)
-            logging.debug(f"Extracted values - source: {source}, target: {target}, weight: {weight}")
-            if source in self.graph and target in self.graph:
-                self.graph.add_edge(source, target, weight=weight)
-                logging.debug(f"Added edge {source} -> {target} with weight {weight}")
-            else:
-                logging.warning(f"Skipping edge with invalid source or target: {source} -> {target}")
-        
-        logging.info("Graph initialization complete")
-        logging.info(f"Number of nodes: {self.graph.number_of_nodes()}")
-        logging.info(f"Number of edges: {self.graph.number_of_edges()}")
-        
-        self.initial_state = {
-            node_id: float(data['value'])
-            for node_id, data in self.graph.nodes(data=True)
-        }
-        self.node_order = list(self.graph.nodes)
+            if debug:
+                logger.debug("Extracted values - id: %s, value: %s, label: %s", node_id, value, label)
+            self.initial_state[node_id] = value
+            node_labels[node_id] = label
+        
+        # The map's structure is compiled once; every run of this simulator reuses it
+        self.compiled = _CompiledFCM(node_labels, self.edges)
+        self.node_ids = self.compiled.node_ids
+        self.node_to_index = self.compiled.node_to_index
+        self.node_labels = self.compiled.node_labels
+        self.W = self.compiled.W
+        self.initial_vec = np.fromiter(self.initial_state.values(), dtype=np.float32, count=len(self.node_ids))
+        
+        logger.info("Graph initialization complete")
+        logger.info("Number of nodes: %s", len(self.node_ids))
+        logger.info("Number of edges: %s", self.compiled.edge_count)
 
     def _parse_node(self, node: Dict) -> Tuple[str, float, str]:
         """Extract id, value, label from a node dict."""
@@ -164,79 +219,136 @@ class FCMSimulator:
         label = str(node.get('label', ''))
         return node_id, value, label
 
-    def _parse_edge(self, edge: Dict) -> Tuple[str, str, float]:
-        """Extract source, target, weight from an edge dict."""
-        source = str(edge.get('source', ''))
-        target = str(edge.get('target', ''))
-        weight = float(edge.get('weight', 0.0))
-        return source, target, weight
+    def _initial_values(self, initial_values: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """Node values a run starts from, with optional per-node overrides."""
+        if not initial_values:
+            return dict(self.initial_state)
+        return {
+            node: float(initial_values.get(node, value))
+            for node, value in self.initial_state.items()
+        }
+
+    def _clamps(self, start: Dict[str, float], clamped_nodes: List[str],
+                clamped_values: Dict[str, float]) -> Dict[int, float]:
+        """Map the index of each clamped node to the value it is held at."""
+        return {
+            self.node_to_index[node]: clamped_values.get(node, start[node])
+            for node in clamped_nodes
+            if node in self.node_to_index
+        }
+
+    def _format_results(self, history: np.ndarray, iterations: int, converged: bool, cycle: int,
+                        initial_values: Dict[str, float], clamped_nodes: List[str]) -> Dict:
+        """Turn a run's state history into the simulation result dict."""
+        if converged:
+            logger.info("Simulation converged")
+        elif cycle:
+            logger.info("Simulation entered a cycle of period %s", cycle)
+        # One tolist() call per array converts every value to a Python float
+        time_series: Dict[str, List[float]] = dict(zip(self.node_ids, history.T.tolist()))
+        final_values = history[-1].tolist()
+        logger.info("Simulation completed after %s iterations", iterations)
+        logger.info("Converged: %s", converged)
+        final_state = {
+            node: {
+                'id': node,
+                'label': self.node_labels[node],
+                'value': value
+            }
+            for node, value in zip(self.node_ids, final_values)
+        }
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Final state: %s", json.dumps(final_state, indent=2))
+        return {
+            'finalState': final_state,
+            'timeSeries': time_series,
+            'iterations': iterations,
+            'converged': converged,
+            'cycleDetected': cycle,
+            'initialValues': initial_values,
+            'clampedNodes': clamped_nodes or []
+        }
 
     def run_simulation(self, clamped_nodes=None, clamped_values=None) -> Dict:
         """Run the FCM simulation, optionally clamping nodes to fixed values."""
         try:
-            logging.info("=== Starting Simulation ===")
-            logging.debug(f"Initial graph state: {[node for node in self.graph.nodes(data=True)]}")
-            time_series: Dict[str, List[float]] = {
-                node: [float(self.graph.nodes[node]['value'])]
-                for node in self.graph.nodes
-            }
-            current_state = {node: self.graph.nodes[node]['value'] for node in self.graph.nodes}
-            logging.debug(f"Initial state: {current_state}")
-            adjacency_matrix = nx.adjacency_matrix(self.graph).todense()
-            logging.debug(f"Adjacency matrix shape: {adjacency_matrix.shape}")
-            converged = False
-            iterations = 0
+            logger.info("=== Starting Simulation ===")
             clamped_nodes = clamped_nodes or []
             clamped_values = clamped_values or {}
-            while not converged and iterations < self.max_iterations:
-                iterations += 1
-                logging.debug(f"Iteration {iterations}")
-                new_state = {}
-                for node in self.graph.nodes:
-                    current_values = np.array([self.graph.nodes[n]['value'] for n in self.node_order])
-                    node_index = self.node_order.index(node)
-                    incoming_weights = np.array(adjacency_matrix)[:, node_index]
-                    if node in clamped_nodes:
-                        new_value = clamped_values.get(node, self.graph.nodes[node]['value'])
-                        logging.debug(f"Node {node}: Clamped at {new_value}")
-                    else:
-                        new_value = float(self.activation(np.dot(current_values, incoming_weights)))
-                        logging.debug(f"Node {node}: {self.graph.nodes[node]['value']} -> {new_value}")
-                    new_state[node] = new_value
-                max_change = max(abs(new_state[node] - self.graph.nodes[node]['value']) 
-                               for node in self.graph.nodes)
-                logging.debug(f"Max change: {max_change}")
-                if max_change < self.threshold:
-                    converged = True
-                    logging.info("Simulation converged")
-                for node, value in new_state.items():
-                    self.graph.nodes[node]['value'] = value
-                    time_series[node].append(value)
-            logging.info(f"Simulation completed after {iterations} iterations")
-            logging.info(f"Converged: {converged}")
-            final_state = {
-                node: {
-                    'id': node,
-                    'label': self.graph.nodes[node]['label'],
-                    'value': float(self.graph.nodes[node]['value'])
-                }
-                for node in self.graph.nodes
-            }
-            logging.debug(f"Final state: {json.dumps(final_state, indent=2)}")
-            return {
-                'finalState': final_state,
-                'timeSeries': time_series,
-                'iterations': iterations,
-                'converged': converged,
-                'initialValues': {node: float(val) for node, val in current_state.items()},
-                'clampedNodes': clamped_nodes or []
-            }
+            initial_values = self._initial_values()
+            clamped = self._clamps(initial_values, clamped_nodes, clamped_values)
+            clamp_idx = np.fromiter(clamped.keys(), dtype=np.intp, count=len(clamped))
+            clamp_vec = np.fromiter(clamped.values(), dtype=np.float32, count=len(clamped))
+            history, iterations, converged, cycle = run_fcm(
+                self.W, self.initial_vec, clamp_idx, clamp_vec,
+                self.activation_id, self.threshold, self.max_iterations
+            )
+            return self._format_results(history, iterations, converged, cycle, initial_values, clamped_nodes)
         except Exception as e:
-            logging.error(f"Error in simulation: {str(e)}")
-            logging.error(f"Error type: {type(e).__name__}")
-            logging.error(f"Traceback: {traceback.format_exc()}")
+            logger.error("Error in simulation: %s", e)
+            logger.error("Error type: %s", type(e).__name__)
+            logger.error("Traceback: %s", traceback.format_exc())
             raise
 
+    def run_batch(self, runs: List[Dict]) -> List[Dict]:
+        """Run several simulations of this graph together, sharing the adjacency matrix.
+
+        Args:
+            runs: One dict per run with optional keys:
+                - initialValues: node ID -> starting value, overriding the graph values
+                - clampedNodes: node IDs held fixed during the run
+                - clampedValues: node ID -> value for clamped nodes
+                  (defaults to the node's starting value)
+
+        Returns:
+            List of result dicts in the same format as run_simulation, one per run
+        """
+        try:
+            logger.info("=== Starting Batch of %s Simulations ===", len(runs))
+            n = len(self.node_ids)
+            initial_states = np.empty((len(runs), n), dtype=np.float32)
+            clamp_mask = np.zeros((len(runs), n), dtype=np.bool_)
+            clamp_vals = np.zeros((len(runs), n), dtype=np.float32)
+            run_initial_values = []
+            for row, run in enumerate(runs):
+                initial_values = self._initial_values(run.get('initialValues'))
+                run_initial_values.append(initial_values)
+                if run.get('initialValues'):
+                    initial_states[row] = np.fromiter(initial_values.values(), dtype=np.float32, count=n)
+                else:
+                    initial_states[row] = self.initial_vec
+                clamped = self._clamps(
+                    initial_values, run.get('clampedNodes') or [], run.get('clampedValues') or {}
+                )
+                for i, value in clamped.items():
+                    clamp_mask[row, i] = True
+                    clamp_vals[row, i] = value
+            history, iterations, converged, cycles = run_fcm_batch(
+                self.W, initial_states, clamp_mask, clamp_vals,
+                self.activation_id, self.threshold, self.max_iterations
+            )
+            return [
+                self._format_results(
+                    history[:iterations[row] + 1, row], int(iterations[row]), bool(converged[row]), int(cycles[row]),
+                    run_initial_values[row], run.get('clampedNodes') or []
+                )
+                for row, run in enumerate(runs)
+            ]
+        except Exception as e:
+            logger.error("Error in batch simulation: %s", e)
+            logger.error("Error type: %s", type(e).__name__)
+            logger.error("Traceback: %s", traceback.format_exc())
+            raise
+
+def _validate_simulation_input(nodes: List[Dict], edges: List[Dict]) -> None:
+    """Check that nodes and edges have the structure FCMSimulator expects."""
+    if not nodes:
+        raise ValueError("No nodes provided for simulation")
+    if not all(isinstance(node, dict) and 'id' in node for node in nodes):
+        raise ValueError("Invalid node structure: all nodes must be dictionaries with 'id'")
+    if not all(isinstance(edge, dict) and 'source' in edge and 'target' in edge for edge in edges):
+        raise ValueError("Invalid edge structure: all edges must be dictionaries with 'source' and 'target'")
+
 def run_simulation(
     nodes: List[Dict],
     edges: List[Dict],
@@ -255,7 +367,9 @@ def run_simulation(
         activation_function: Activation function to use ('sigmoid', 'tanh', 'relu')
         threshold: Convergence threshold for simulation
         max_iterations: Maximum number of iterations before stopping
-        generate_notebook: Whether to generate a Jupyter notebook (deprecated, use export.py instead)
+        generate_notebook: Ignored (deprecated). Notebooks are built by
+            export.generate_notebook_json from results the caller already has,
+            so the simulation is never run a second time for them.
         clamped_nodes: List of node IDs to clamp during simulation
         clamped_values: Dictionary mapping node IDs to their clamped values
         
@@ -265,6 +379,7 @@ def run_simulation(
         - timeSeries: Time series data for all nodes
         - iterations: Number of iterations performed
         - converged: Whether simulation converged
+        - cycleDetected: Period of the limit cycle the run stopped in (0 if none)
         - initialValues: Initial values of all nodes
         - clampedNodes: List of clamped nodes
         
@@ -272,15 +387,9 @@ def run_simulation(
         ValueError: If simulation fails or input data is invalid
     """
     try:
-        logging.info("Running simulation...")
+        logger.info("Running simulation...")
         
-        # Validate input data
-        if not nodes:
-            raise ValueError("No nodes provided for simulation")
-        if not all(isinstance(node, dict) and 'id' in node for node in nodes):
-            raise ValueError("Invalid node structure: all nodes must be dictionaries with 'id'")
-        if not all(isinstance(edge, dict) and 'source' in edge and 'target' in edge for edge in edges):
-            raise ValueError("Invalid edge structure: all edges must be dictionaries with 'source' and 'target'")
+        _validate_simulation_input(nodes, edges)
         
         # Create simulator instance
         simulator = FCMSimulator(
@@ -297,8 +406,8 @@ def run_simulation(
             clamped_values=clamped_values
         )
         
-        logging.info("Simulation completed successfully")
-        logging.debug(f"Time series data structure: {len(results.get('timeSeries', {}).get(list(results['timeSeries'].keys())[0], []))} iterations")
+        logger.info("Simulation completed successfully")
+        logger.debug("Time series data structure: %d iterations", results['iterations'] + 1)
         
         # Return results in the correct format
         return {
@@ -306,14 +415,15 @@ def run_simulation(
             'timeSeries': results.get('timeSeries', {}),
             'iterations': results.get('iterations', 0),
             'converged': results.get('converged', False),
+            'cycleDetected': results.get('cycleDetected', 0),
             'initialValues': results.get('initialValues', {}),
             'clampedNodes': clamped_nodes or []
         }
         
     except Exception as e:
-        logging.error(f"Error in simulation: {str(e)}")
-        logging.error(f"Error type: {type(e).__name__}")
-        logging.error(f"Traceback: {traceback.format_exc()}")
+        logger.error("Error in simulation: %s", e)
+        logger.error("Error type: %s", type(e).__name__)
+        logger.error("Traceback: %s", traceback.format_exc())
         raise ValueError(f"Simulation failed: {str(e)}")
 
 def apply_initial_values(
@@ -327,14 +437,15 @@ def apply_initial_values(
         initial_values: Dictionary mapping node IDs to initial values
         
     Returns:
-        List of updated node dictionaries with initial values applied
+        List of node dictionaries with initial values applied. Overridden nodes
+        are new dicts; the input nodes are not modified.
         
     Raises:
         ValueError: If a node ID in initial_values is not found in nodes
         TypeError: If node values cannot be converted to float
     """
     try:
-        logging.info(f"Applying initial values: {initial_values}")
+        logger.info("Applying initial values: %s", initial_values)
         
         # Validate input
         if not nodes:
@@ -345,32 +456,83 @@ def apply_initial_values(
         # Create a set of valid node IDs for quick lookup
         valid_node_ids = {str(node['id']) for node in nodes}
         
-        # Validate initial values
+        # Validate and convert initial values up front, so applying them is one pass
+        overrides: Dict[str, float] = {}
         if initial_values:
             invalid_ids = set(initial_values.keys()) - valid_node_ids
             if invalid_ids:
                 raise ValueError(f"Initial values provided for non-existent nodes: {invalid_ids}")
-        
-        # Apply values
-        for node in nodes:
-            node_id = str(node['id'])
-            if initial_values and node_id in initial_values:
+            for node_id, value in initial_values.items():
                 try:
-                    node['value'] = float(initial_values[node_id])
-                    logging.info(f"Set node {node_id} value to {node['value']} from initial values")
+                    overrides[node_id] = float(value)
                 except (TypeError, ValueError) as e:
-                    raise TypeError(f"Invalid value for node {node_id}: {initial_values[node_id]}") from e
-            else:
-                logging.info(f"Using default value {node.get('value', 0)} for node {node_id}")
+                    raise TypeError(f"Invalid value for node {node_id}: {value}") from e
         
+        # Apply values
+        nodes = [
+            {**node, 'value': overrides[str(node['id'])]} if str(node['id']) in overrides else node
+            for node in nodes
+        ]
+        logger.info("Set %d of %d node values from initial values", len(overrides), len(nodes))
         return nodes
         
     except Exception as e:
-        logging.error(f"Error applying initial values: {str(e)}")
-        logging.error(f"Error type: {type(e).__name__}")
-        logging.error(f"Traceback: {traceback.format_exc()}")
+        logger.error("Error applying initial values: %s", e)
+        logger.error("Error type: %s", type(e).__name__)
+        logger.error("Traceback: %s", traceback.format_exc())
         raise
 
+def _categorize_diff(
+    diff_series: np.ndarray,
+    max_abs: float,
+    auc: float,
+    global_max_change: float,
+    epsilon: float = 1e-4
+) -> str:
+    """Categorize a scenario-minus-baseline difference series.
+    
+    Shared by fuzzy_categorize_direction and the batched impact metrics, which
+    pass in the max-abs difference and AUC they have already computed.
+    """
+    final_delta = diff_series[-1]
+    rel = max_abs / (global_max_change + epsilon)
+
+    if rel <= 0.1:
+        return "No Change"
+
+    # Magnitude label
+    if rel > 0.7:
+        mag = "High"
+    elif rel > 0.3:
+        mag = "Medium"
+    else:
+        mag = "Low"
+
+    # Oscillating: more than one sign flip among the nonzero differences
+    nonzero = diff_series[diff_series != 0]
+    if nonzero.size > 1:
+        crosses = np.count_nonzero(np.diff(np.signbit(nonzero)))
+        if crosses > 1:
+            return f"Oscillating ({mag})"
+
+    # Temporary change: returns to near baseline at end (relative threshold)
+    if np.abs(final_delta) < max(epsilon, 0.05 * max_abs):
+        return f"Temporary {mag} {'Increase' if auc > 0 else 'Decrease'}"
+
+    # Sustained change
+    if final_delta > epsilon:
+        return f"{mag} Increase"
+    elif final_delta < -epsilon:
+        return f"{mag} Decrease"
+
+    # Fallback: use AUC (area under the curve)
+    if auc > 0:
+        return f"{mag} Increase"
+    elif auc < 0:
+        return f"{mag} Decrease"
+
+    return "No Change"
+
 def fuzzy_categorize_direction(
     baseline_series: List[float],
     scenario_series: List[float],
@@ -398,69 +560,37 @@ def fuzzy_categorize_direction(
             raise ValueError("Baseline and scenario series must be of equal length.")
         
         diff_series = np.array(scenario_series) - np.array(baseline_series)
-        final_delta = diff_series[-1]
-        max_abs = np.max(np.abs(diff_series))
-        rel = max_abs / (global_max_change + epsilon)
-
-        if rel <= 0.1:
-            return "No Change"
-
-        # Magnitude label
-        if rel > 0.7:
-            mag = "High"
-        elif rel > 0.3:
-            mag = "Medium"
-        else:
-            mag = "Low"
-
-        # Oscillating: more than one sign flip
-        signs = np.sign(diff_series)
-        nonzero_signs = signs[signs != 0]
-        if len(nonzero_signs) > 1:
-            crosses = np.sum(np.diff(nonzero_signs) != 0)
-            if crosses > 1:
-                return f"Oscillating ({mag})"
-
-        auc = np.trapz(diff_series)
-        # Temporary change: returns to near baseline at end (relative threshold)
-        if rel > 0.1 and np.abs(final_delta) < max(epsilon, 0.05 * max_abs):
-            return f"Temporary {mag} {'Increase' if auc > 0 else 'Decrease'}"
-
-        # Sustained change
-        if final_delta > epsilon:
-            return f"{mag} Increase"
-        elif final_delta < -epsilon:
-            return f"{mag} Decrease"
-
-        # Fallback: use AUC (area under the curve)
-        if auc > 0:
-            return f"{mag} Increase"
-        elif auc < 0:
-            return f"{mag} Decrease"
-
-        return "No Change"
+        return _categorize_diff(
+            diff_series,
+            np.max(np.abs(diff_series)),
+            np.trapezoid(diff_series),
+            global_max_change,
+            epsilon
+        )
     except Exception as e:
-        logging.error(f"Error in fuzzy_categorize_direction: {str(e)}")
-        logging.error(f"Error type: {type(e).__name__}")
-        logging.error(f"Traceback: {traceback.format_exc()}")
+        logger.error("Error in fuzzy_categorize_direction: %s", e)
+        logger.error("Error type: %s", type(e).__name__)
+        logger.error("Traceback: %s", traceback.format_exc())
         raise
 
 def _calculate_impact_metrics(
-    node_id: str,
     baseline_results: Dict,
     scenario_results: Dict,
-    global_max_change: float
-) -> Dict:
-    """Calculate impact metrics for a single node.
+    clamped_nodes: Optional[List[str]] = None
+) -> Dict[str, Dict]:
+    """Calculate impact metrics for every node of a baseline/scenario pair.
+    
+    The node series are stacked into two ``(nodes, T)`` matrices truncated to
+    the shorter run, so the per-node metrics reduce to a few NumPy reductions.
     
     Args:
-        node_id: ID of the node to analyze.
         baseline_results: Results from baseline simulation (dict with 'finalState' and 'timeSeries').
         scenario_results: Results from scenario simulation (dict with 'finalState' and 'timeSeries').
-        global_max_change: Global maximum change for relative comparison.
+        clamped_nodes: Node IDs excluded from the global maximum change used for
+            the direction labels.
     
     Returns:
-        Dictionary containing impact metrics for the node:
+        Dictionary mapping node IDs to impact metrics, each containing:
             - id: Node ID
             - label: Node label
             - baseline: Baseline final value
@@ -472,54 +602,90 @@ def _calculate_impact_metrics(
             - direction: Fuzzy direction label
     
     Raises:
-        ValueError: If node_id is missing from results or series are empty.
+        ValueError: If a node is missing from the results or series are empty.
     """
     try:
-        if node_id not in baseline_results['finalState'] or node_id not in scenario_results['finalState']:
-            raise ValueError(f"Node ID {node_id} missing from finalState.")
-        if node_id not in baseline_results['timeSeries'] or node_id not in scenario_results['timeSeries']:
-            raise ValueError(f"Node ID {node_id} missing from timeSeries.")
-        
-        baseline_value = baseline_results['finalState'][node_id]['value']
-        scenario_value = scenario_results['finalState'][node_id]['value']
-        
-        # Normalized percent change
-        epsilon = 1e-8
-        denom = max(abs(scenario_value), abs(baseline_value), epsilon)
-        normalized_change = ((scenario_value - baseline_value) / denom) * 100
-        
-        # Time series analysis
-        baseline_series = baseline_results['timeSeries'][node_id]
-        scenario_series = scenario_results['timeSeries'][node_id]
-        min_len = min(len(baseline_series), len(scenario_series))
+        baseline_state = baseline_results['finalState']
+        scenario_state = scenario_results['finalState']
+        baseline_ts = baseline_results['timeSeries']
+        scenario_ts = scenario_results['timeSeries']
+        node_ids = list(baseline_state)
+        for node_id in node_ids:
+            if node_id not in scenario_state:
+                raise ValueError(f"Node ID {node_id} missing from finalState.")
+            if node_id not in baseline_ts or node_id not in scenario_ts:
+                raise ValueError(f"Node ID {node_id} missing from timeSeries.")
+        if not node_ids:
+            return {}
+        
+        min_len = min(
+            min(len(baseline_ts[node_id]) for node_id in node_ids),
+            min(len(scenario_ts[node_id]) for node_id in node_ids)
+        )
         if min_len == 0:
-            raise ValueError(f"Empty time series for node {node_id}.")
-        baseline_series = baseline_series[:min_len]
-        scenario_series = scenario_series[:min_len]
-        diff_series = [s - b for s, b in zip(scenario_series, baseline_series)]
+            raise ValueError("Empty time series in simulation results.")
+        B = np.array([baseline_ts[node_id][:min_len] for node_id in node_ids], dtype=np.float64)
+        S = np.array([scenario_ts[node_id][:min_len] for node_id in node_ids], dtype=np.float64)
+        D = S - B
+        abs_D = np.abs(D)
+        max_abs = abs_D.max(axis=1)
+        max_diff = D[np.arange(len(node_ids)), abs_D.argmax(axis=1)]
+        auc = np.trapezoid(D, axis=1) if min_len > 1 else np.zeros(len(node_ids))
+        
+        clamped = set(clamped_nodes or ())
+        unclamped = np.fromiter((node_id not in clamped for node_id in node_ids), dtype=bool, count=len(node_ids))
+        global_max_change = float(max_abs[unclamped].max()) if unclamped.any() else 1.0
+        
+        # Final values come from finalState, which holds the untruncated run
+        baseline_final = np.array([baseline_state[node_id]['value'] for node_id in node_ids], dtype=np.float64)
+        scenario_final = np.array([scenario_state[node_id]['value'] for node_id in node_ids], dtype=np.float64)
+        delta = scenario_final - baseline_final
+        denom = np.maximum(np.maximum(np.abs(scenario_final), np.abs(baseline_final)), 1e-8)
+        normalized_change = delta / denom * 100
         
-        # Calculate metrics
-        auc = float(np.trapz(diff_series)) if len(diff_series) > 1 else 0.0
-        max_diff = max(diff_series, key=abs) if diff_series else 0.0
-        direction = fuzzy_categorize_direction(baseline_series, scenario_series, global_max_change)
-        
-        return {
-            'id': node_id,
-            'label': baseline_results['finalState'][node_id]['label'],
-            'baseline': baseline_value,
-            'scenario': scenario_value,
-            'delta': scenario_value - baseline_value,
-            'normalizedChangePercent': normalized_change,
-            'auc': auc,
-            'maxDifference': max_diff,
-            'direction': direction
-        }
+        impact_metrics = {}
+        for i, node_id in enumerate(node_ids):
+            impact_metrics[node_id] = {
+                'id': node_id,
+                'label': baseline_state[node_id]['label'],
+                'baseline': baseline_state[node_id]['value'],
+                'scenario': scenario_state[node_id]['value'],
+                'delta': float(delta[i]),
+                'normalizedChangePercent': float(normalized_change[i]),
+                'auc': float(auc[i]),
+                'maxDifference': float(max_diff[i]),
+                'direction': _categorize_diff(
+                    D[i], max_abs[i], auc[i], global_max_change
+                )
+            }
+        return impact_metrics
     except Exception as e:
-        logging.error(f"Error in _calculate_impact_metrics for node {node_id}: {str(e)}")
-        logging.error(f"Error type: {type(e).__name__}")
-        logging.error(f"Traceback: {traceback.format_exc()}")
+        logger.error("Error in _calculate_impact_metrics: %s", e)
+        logger.error("Error type: %s", type(e).__name__)
+        logger.error("Traceback: %s", traceback.format_exc())
         raise
 
+def _nodes_with_values(
+    nodes: List[Dict],
+    initial_values: Optional[Dict[str, float]],
+    run_name: str
+) -> List[Dict]:
+    """Nodes with 'value' set from initial_values where given, in one pass.
+    
+    Copy-on-write: only overridden nodes are copied (shallowly, as only the
+    top-level 'value' changes); the rest are shared with the caller's list.
+    Neither the caller's nodes nor the returned ones are mutated afterwards.
+    """
+    if initial_values:
+        logger.info("Applying %s initial values: %s", run_name, initial_values)
+    result = []
+    for node in nodes:
+        if initial_values and node['id'] in initial_values:
+            node = {**node, 'value': initial_values[node['id']]}
+            logger.info("Setting %s node %s to %s", run_name, node['id'], node['value'])
+        result.append(node)
+    return result
+
 def run_baseline_scenario_comparison(
     nodes: List[Dict],
     edges: List[Dict],
@@ -551,6 +717,7 @@ def run_baseline_scenario_comparison(
         - deltaFinalState: Difference between final states
         - impactMetrics: Detailed impact metrics for each node
         - converged: Whether both simulations converged
+        - cycleDetected: Longest cycle period either simulation stopped in (0 if none)
         - iterations: Maximum iterations taken
         - clampedNodes: List of clamped nodes
         
@@ -558,32 +725,18 @@ def run_baseline_scenario_comparison(
         ValueError: If simulation fails or input data is invalid
     """
     try:
-        logging.info("=== Starting Baseline vs Scenario Comparison ===")
-        logging.info(f"Model initial values: {model_initial_values}")
-        logging.info(f"Scenario initial values: {scenario_initial_values}")
-        logging.info(f"Clamped nodes: {clamped_nodes}")
-        
-        # Create copies of nodes for baseline and scenario
-        baseline_nodes = copy.deepcopy(nodes)
-        scenario_nodes = copy.deepcopy(nodes)
-        
-        # Apply initial values
-        if model_initial_values:
-            logging.info(f"Applying model initial values: {model_initial_values}")
-            for node in baseline_nodes:
-                if node['id'] in model_initial_values:
-                    node['value'] = model_initial_values[node['id']]
-                    logging.info(f"Setting baseline node {node['id']} to {node['value']}")
-        
-        if scenario_initial_values:
-            logging.info(f"Applying scenario initial values: {scenario_initial_values}")
-            for node in scenario_nodes:
-                if node['id'] in scenario_initial_values:
-                    node['value'] = scenario_initial_values[node['id']]
-                    logging.info(f"Setting scenario node {node['id']} to {node['value']}")
-        
-        logging.info(f"Baseline node values: {[(n['id'], n['value']) for n in baseline_nodes]}")
-        logging.info(f"Scenario node values: {[(n['id'], n['value']) for n in scenario_nodes]}")
+        logger.info("=== Starting Baseline vs Scenario Comparison ===")
+        logger.info("Model initial values: %s", model_initial_values)
+        logger.info("Scenario initial values: %s", scenario_initial_values)
+        logger.info("Clamped nodes: %s", clamped_nodes)
+        
+        # Copy nodes for baseline and scenario, applying initial values
+        baseline_nodes = _nodes_with_values(nodes, model_initial_values, 'baseline')
+        scenario_nodes = _nodes_with_values(nodes, scenario_initial_values, 'scenario')
+        
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Baseline node values: %s", [(n['id'], n['value']) for n in baseline_nodes])
+            logger.info("Scenario node values: %s", [(n['id'], n['value']) for n in scenario_nodes])
         
         # Prepare clamped values for scenario
         clamped_values = {
@@ -592,70 +745,53 @@ def run_baseline_scenario_comparison(
             if clamped_nodes and node['id'] in clamped_nodes
         }
         
-        # Run simulations
-        baseline_results = run_simulation(
+        # Both runs share the graph, so simulate them as one batch over a single
+        # adjacency matrix. Node values are normalized as FCMSimulator would.
+        _validate_simulation_input(baseline_nodes, edges)
+        simulator = FCMSimulator(
             nodes=baseline_nodes,
             edges=edges,
             activation_function=activation_function,
             threshold=threshold,
             max_iterations=max_iterations
         )
-        
-        scenario_results = run_simulation(
-            nodes=scenario_nodes,
-            edges=edges,
-            activation_function=activation_function,
-            threshold=threshold,
-            max_iterations=max_iterations,
-            clamped_nodes=clamped_nodes,
-            clamped_values=clamped_values
-        )
+        scenario_values = {}
+        for node in scenario_nodes:
+            normalized = normalize_node(node)
+            scenario_values[normalized['id']] = normalized['value']
+        baseline_results, scenario_results = simulator.run_batch([
+            {},
+            {
+                'initialValues': scenario_values,
+                'clampedNodes': clamped_nodes,
+                'clampedValues': clamped_values
+            }
+        ])
         
         # Log time series data for debugging
-        logging.debug("Time Series Data:")
-        logging.debug("Baseline Time Series:")
-        for node_id, values in baseline_results['timeSeries'].items():
-            logging.debug(f"  {node_id}: {values}")
-        
-        logging.debug("Scenario Time Series:")
-        for node_id, values in scenario_results['timeSeries'].items():
-            logging.debug(f"  {node_id}: {values}")
-        
-        # Calculate global max change for fuzzy direction
-        all_diff_series = []
-        for node_id in baseline_results['finalState']:
-            if clamped_nodes and node_id in clamped_nodes:
-                continue  # skip clamped nodes for global max
-            baseline_series = baseline_results['timeSeries'][node_id]
-            scenario_series = scenario_results['timeSeries'][node_id]
-            min_len = min(len(baseline_series), len(scenario_series))
-            baseline_series = baseline_series[:min_len]
-            scenario_series = scenario_series[:min_len]
-            diff_series = [s - b for s, b in zip(scenario_series, baseline_series)]
-            all_diff_series.append(np.max(np.abs(diff_series)))
-        
-        global_max_change = max(all_diff_series) if all_diff_series else 1.0
-        
-        # Calculate impact metrics for each node
-        impact_metrics = {}
-        delta_final_state = {}
-        
-        for node_id in baseline_results['finalState']:
-            # Calculate impact metrics
-            metrics = _calculate_impact_metrics(
-                node_id,
-                baseline_results,
-                scenario_results,
-                global_max_change
-            )
-            impact_metrics[node_id] = metrics
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Time Series Data:")
+            logger.debug("Baseline Time Series:")
+            for node_id, values in baseline_results['timeSeries'].items():
+                logger.debug("  %s: %s", node_id, values)
             
-            # Calculate delta final state
-            delta_final_state[node_id] = {
+            logger.debug("Scenario Time Series:")
+            for node_id, values in scenario_results['timeSeries'].items():
+                logger.debug("  %s: %s", node_id, values)
+        
+        impact_metrics = _calculate_impact_metrics(
+            baseline_results,
+            scenario_results,
+            clamped_nodes
+        )
+        delta_final_state = {
+            node_id: {
                 'id': node_id,
-                'label': baseline_results['finalState'][node_id]['label'],
-                'value': scenario_results['finalState'][node_id]['value'] - baseline_results['finalState'][node_id]['value']
+                'label': metrics['label'],
+                'value': metrics['delta']
             }
+            for node_id, metrics in impact_metrics.items()
+        }
         
         return {
             'baselineFinalState': baseline_results['finalState'],
@@ -665,12 +801,13 @@ def run_baseline_scenario_comparison(
             'deltaFinalState': delta_final_state,
             'impactMetrics': impact_metrics,
             'converged': baseline_results['converged'] and scenario_results['converged'],
+            'cycleDetected': max(baseline_results['cycleDetected'], scenario_results['cycleDetected']),
             'iterations': max(baseline_results['iterations'], scenario_results['iterations']),
             'clampedNodes': clamped_nodes or []
         }
         
     except Exception as e:
-        logging.error(f"Error in baseline-scenario comparison: {str(e)}")
-        logging.error(f"Error type: {type(e).__name__}")
-        logging.error(f"Traceback: {traceback.format_exc()}")
+        logger.error("Error in baseline-scenario comparison: %s", e)
+        logger.error("Error type: %s", type(e).__name__)
+        logger.error("Traceback: %s", traceback.format_exc())
         raise ValueError(f"Baseline-scenario comparison failed: {str(e)}")
\ No newline at end of file
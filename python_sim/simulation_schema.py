@@ -5,16 +5,28 @@ This module contains all Pydantic models used for validating API requests and re
 It serves as the single source of truth for the structure of data exchanged between the frontend and backend.
 Any changes to API payloads must be reflected here.
 """
-from typing import List, Dict, Any, Optional, Union
-from pydantic import BaseModel, Field, root_validator
+import logging
+from dataclasses import dataclass
+from typing import List, Dict, Any, Literal, Optional, Union
+from pydantic import BaseModel, ConfigDict, Field, with_config
 
-class SimulationNode(BaseModel):
+logger = logging.getLogger(__name__)
+
+# Leaf records are slotted dataclasses rather than BaseModels: pydantic still
+# validates them field by field, but each instance is a small slotted object
+# instead of a dict-backed model, which adds up on large graphs. Unknown keys
+# are dropped, as they were for the BaseModel versions.
+@with_config(ConfigDict(extra='ignore'))
+@dataclass(slots=True, frozen=True)
+class SimulationNode:
     id: str
-    label: Optional[str] = None
     value: float
+    label: Optional[str] = None
     type: Optional[str] = None
 
-class SimulationEdge(BaseModel):
+@with_config(ConfigDict(extra='ignore'))
+@dataclass(slots=True, frozen=True)
+class SimulationEdge:
     source: str
     target: str
     weight: float
@@ -37,13 +49,21 @@ class SimulationInputSchema(BaseModel):
     activationFunction: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
 
-    class Config:
-        extra = "allow"  # Accept unknown fields
+    model_config = ConfigDict(extra="allow")  # Accept unknown fields (kept in model_extra)
 
     def log_unknown_fields(self):
-        known = set(self.__fields__.keys())
-        unknown = set(self.__dict__.keys()) - known
-        if unknown:
-            print(f"[SimulationInputSchema] Unknown fields received: {unknown}")
-            for field in unknown:
-                print(f"  {field}: {getattr(self, field)}") 
\ No newline at end of file
+        # With extra="allow", pydantic already keeps exactly the unknown fields
+        # in model_extra, so there is no known-field set to diff against
+        unknown = self.model_extra
+        if unknown and logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "[SimulationInputSchema] Unknown fields received: %s\n%s",
+                set(unknown),
+                "\n".join(f"  {field}: {value}" for field, value in unknown.items()),
+            )
+
+# Envelope of an /api/export/excel request; `data` is passed to the exporter as-is
+class ExportRequestSchema(BaseModel):
+    data: Dict[str, Any] = Field(..., min_length=1, description="Model, scenario or analysis to export")
+    type: Literal['model', 'scenario', 'analysis'] = Field(..., description="Export type")
+    fileName: Optional[str] = None
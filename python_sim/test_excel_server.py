@@ -1,7 +1,18 @@
+import functools
 import json
-import io
+import logging
+from pathlib import Path
 from flask import Flask, request, jsonify, send_file
-from export import model_to_excel
+from pydantic import ValidationError
+from export import excel_export
+from simulation_schema import ExportRequestSchema
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
@@ -9,130 +20,86 @@ app = Flask(__name__)
 def export_excel():
     """
     Export data to Excel format.
+
+    Like the app's endpoint, only the request envelope is validated; the
+    model itself goes to the exporter as a plain dict.
     """
     try:
-        # Get data from request
-        data = request.json.get('data')
-        export_type = request.json.get('type')
-        
-        if not data or not export_type:
+        # Decode the request body once
+        body = request.get_data(cache=False)
+        payload = orjson.loads(body) if orjson is not None else json.loads(body)
+        try:
+            export_request = ExportRequestSchema.model_validate(payload)
+        except ValidationError as e:
             return jsonify({
-                'error': 'Missing required data',
-                'message': 'Data and type are required'
+                'error': 'Invalid export request',
+                'message': str(e)
             }), 400
+        data = export_request.data
+        export_type = export_request.type
         
-        print(f"Exporting {export_type} to Excel")
-        print(f"Data keys: {list(data.keys())}")
+        logger.debug("Exporting %s to Excel", export_type)
+        logger.debug("Data keys: %s", data.keys())
         
         # Generate Excel file based on type
         if export_type == 'model':
-            print(f"Model nodes: {len(data.get('nodes', []))}")
-            print(f"Model edges: {len(data.get('edges', []))}")
-            print(f"Model analysis: {list(data.get('analysis', {}).keys())}")
-            excel_data = model_to_excel(data)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Model nodes: %d", len(data.get('nodes', [])))
+                logger.debug("Model edges: %d", len(data.get('edges', [])))
+                logger.debug("Model analysis: %s", data.get('analysis', {}).keys())
+            excel_file, digest = excel_export(data, 'model')
         else:
             return jsonify({
                 'error': 'Invalid export type',
                 'message': f'Export type {export_type} not supported'
             }), 400
         
-        # Create a file-like object from the Excel data
-        excel_file = io.BytesIO(excel_data)
-        excel_file.seek(0)
-        
         # Return the Excel file
         return send_file(
             excel_file,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
-            download_name="test_export_server.xlsx"
+            download_name="test_export_server.xlsx",
+            etag=digest
         )
         
     except Exception as e:
-        print(f"Error generating Excel file: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error generating Excel file: %s", e)
         return jsonify({
             'error': 'Failed to generate Excel file',
             'message': str(e)
         }), 500
 
-# Create a test client
-client = app.test_client()
+@functools.lru_cache(maxsize=1)
+def get_client():
+    """Test client for app, created on first use and shared afterwards."""
+    return app.test_client()
+
+# Create a test model (shared with test_excel.py)
+test_model = json.loads((Path(__file__).parent.parent / 'tests' / 'fixtures' / 'sample_model_nested.json').read_text())
+
+# Request body encoded once up front, so repeated posts skip JSON encoding
+PAYLOAD = {'data': test_model, 'type': 'model'}
+PAYLOAD_BYTES = orjson.dumps(PAYLOAD) if orjson is not None else json.dumps(PAYLOAD).encode()
 
-# Create a test model
-test_model = {
-    "name": "Test Model",
-    "description": "A test model for Excel export",
-    "nodes": [
-        {
-            "id": "node1",
-            "data": {
-                "label": "Node 1",
-                "type": "regular",
-                "value": 0.5,
-                "color": "#3498db"
-            },
-            "position": {"x": 100, "y": 100}
-        },
-        {
-            "id": "node2",
-            "data": {
-                "label": "Node 2",
-                "type": "driver",
-                "value": 0.8,
-                "color": "#e74c3c"
-            },
-            "position": {"x": 200, "y": 200}
-        }
-    ],
-    "edges": [
-        {
-            "id": "edge1",
-            "source": "node1",
-            "target": "node2",
-            "data": {
-                "weight": 0.7,
-                "label": "Influences"
-            }
-        }
-    ],
-    "analysis": {
-        "nodeCount": 2,
-        "edgeCount": 1,
-        "density": 0.5,
-        "isConnected": True,
-        "hasLoop": False,
-        "degree_centrality": {
-            "node1": 0.5,
-            "node2": 0.5
-        },
-        "in_degree_centrality": {
-            "node1": 0.0,
-            "node2": 1.0
-        },
-        "out_degree_centrality": {
-            "node1": 1.0,
-            "node2": 0.0
-        }
-    }
-}
+def main():
+    """Export the test model through the app and save the result."""
+    # Make a request to the export endpoint
+    response = get_client().post(
+        '/api/export/excel',
+        data=PAYLOAD_BYTES,
+        content_type='application/json'
+    )
 
-# Make a request to the export endpoint
-response = client.post(
-    '/api/export/excel',
-    json={
-        'data': test_model,
-        'type': 'model'
-    }
-)
+    # Check if the response is successful
+    if response.status_code == 200:
+        # Save the Excel file
+        with open("test_export_server.xlsx", "wb") as f:
+            f.write(response.data)
+        print("Excel file generated: test_export_server.xlsx")
+    else:
+        print(f"Error: {response.status_code}")
+        print(response.json)
 
-# Check if the response is successful
-if response.status_code == 200:
-    # Save the Excel file
-    with open("test_export_server.xlsx", "wb") as f:
-        f.write(response.data)
-    print("Excel file generated: test_export_server.xlsx")
-else:
-    print(f"Error: {response.status_code}")
-    print(response.json) 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
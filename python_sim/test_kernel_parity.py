@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from _fcm_kernel import ACTIVATION_IDS, NUMBA_AVAILABLE, _run_fcm_numpy, _run_fcm_batch_numpy, run_fcm, run_fcm_batch
+
+# Permutation maps that oscillate under relu: a 2-node swap (period 2) and a
+# 3-node rotation (period 3). Kernels take dense matrices column-major.
+OSCILLATING_MAPS = {
+    'swap': np.asfortranarray(np.array([[0, 1], [1, 0]], dtype=np.float32)),
+    'rotation': np.asfortranarray(np.array([[0, 1, 0], [0, 0, 1], [1, 0, 0]], dtype=np.float32)),
+}
+
+def _random_map(n, density, seed):
+    rng = np.random.default_rng(seed)
+    weights = rng.uniform(-1, 1, (n, n)) * (rng.random((n, n)) < density)
+    return np.asfortranarray(weights.astype(np.float32))
+
+# Maps that settle onto a fixed point under sigmoid. 'damped' gets there through
+# a slowly shrinking oscillation, which a cycle check must not mistake for a
+# period-2 cycle however small the convergence threshold.
+CONVERGING_MAPS = {
+    'damped': np.asfortranarray(np.full((2, 2), -1, dtype=np.float32)),
+    'random': _random_map(8, 0.4, seed=3),
+}
+THRESHOLDS = (0.001, 5e-7, 0.0)
+NO_CLAMP_IDX = np.array([], dtype=np.intp)
+NO_CLAMP_VEC = np.array([], dtype=np.float32)
+
+# Without numba, run_fcm and run_fcm_batch are the NumPy kernels themselves
+requires_numba = pytest.mark.skipif(not NUMBA_AVAILABLE, reason="numba is not installed")
+
+def check_single(W, s0, act_id, threshold=0.001, max_iter=100, clamp_idx=NO_CLAMP_IDX, clamp_vec=NO_CLAMP_VEC):
+    """Compare one run of the NumPy kernel with run_fcm on dense and CSC forms of W."""
+    for adjacency in (W, sparse.csc_array(W)):
+        expected = _run_fcm_numpy(adjacency, s0, clamp_idx, clamp_vec, act_id, threshold, max_iter)
+        actual = run_fcm(adjacency, s0, clamp_idx, clamp_vec, act_id, threshold, max_iter)
+        assert expected[1:] == actual[1:], (expected[1:], actual[1:])
+        np.testing.assert_allclose(expected[0], actual[0], atol=1e-6)
+
+def check_batch(W, S0, act_id, threshold=0.001, max_iter=100, clamp_mask=None, clamp_vals=None):
+    """Compare the batched NumPy kernel with run_fcm_batch on dense and CSC forms of W."""
+    if clamp_mask is None:
+        clamp_mask = np.zeros(S0.shape, dtype=np.bool_)
+        clamp_vals = np.zeros_like(S0)
+    for adjacency in (W, sparse.csc_array(W)):
+        expected = _run_fcm_batch_numpy(adjacency, S0, clamp_mask, clamp_vals, act_id, threshold, max_iter)
+        actual = run_fcm_batch(adjacency, S0, clamp_mask, clamp_vals, act_id, threshold, max_iter)
+        for want, got in zip(expected[1:], actual[1:]):
+            np.testing.assert_array_equal(want, got)
+        np.testing.assert_allclose(expected[0], actual[0], atol=1e-6)
+
+@requires_numba
+def test_oscillating_maps():
+    """NumPy fallback and compiled kernels agree on iterations, convergence and cycle period."""
+    for W in OSCILLATING_MAPS.values():
+        S0 = np.eye(W.shape[0], dtype=np.float32)
+        for act_id in ACTIVATION_IDS.values():
+            for s0 in S0:
+                check_single(W, s0, act_id)
+            check_batch(W, S0, act_id)
+
+@requires_numba
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+def test_converging_maps(threshold):
+    """Kernels agree on converging maps, with and without clamped nodes, down to a zero threshold."""
+    for W in CONVERGING_MAPS.values():
+        n = W.shape[0]
+        S0 = np.linspace(-1, 1, 3 * n, dtype=np.float32).reshape(3, n)
+        clamp_mask = np.zeros(S0.shape, dtype=np.bool_)
+        clamp_mask[1:, 0] = True
+        clamp_vals = np.where(clamp_mask, np.float32(0.75), np.float32(0)).astype(np.float32)
+        for act_id in (ACTIVATION_IDS['sigmoid'], ACTIVATION_IDS['tanh']):
+            check_single(W, S0[0], act_id, threshold, 200)
+            check_single(W, S0[1], act_id, threshold, 200,
+                         np.array([0], dtype=np.intp), np.array([0.75], dtype=np.float32))
+            check_batch(W, S0, act_id, threshold, 200, clamp_mask, clamp_vals)
+
+@pytest.mark.parametrize("threshold", (1e-7, 1e-9))
+def test_small_threshold_settling_is_not_a_cycle(threshold):
+    """A run still settling onto a fixed point is not cut short as a limit cycle."""
+    W = CONVERGING_MAPS['damped']
+    s0 = np.array([1, 0], dtype=np.float32)
+    _, iterations, converged, cycle = _run_fcm_numpy(W, s0, NO_CLAMP_IDX, NO_CLAMP_VEC, ACTIVATION_IDS['sigmoid'], threshold, 200)
+    assert (converged, cycle) == (True, 0), (iterations, converged, cycle)
+    _, iterations, converged, cycles = _run_fcm_batch_numpy(
+        W, s0[None, :], np.zeros((1, 2), dtype=np.bool_), np.zeros((1, 2), dtype=np.float32),
+        ACTIVATION_IDS['sigmoid'], threshold, 200
+    )
+    assert (converged[0], cycles[0]) == (True, 0)
+
+def test_zero_threshold_fixed_point_is_not_a_cycle():
+    """With threshold 0 nothing converges, and a state that stopped moving is no period-2 cycle."""
+    W = CONVERGING_MAPS['damped']
+    s0 = np.array([1, 0], dtype=np.float32)
+    _, iterations, converged, cycle = _run_fcm_numpy(W, s0, NO_CLAMP_IDX, NO_CLAMP_VEC, ACTIVATION_IDS['sigmoid'], 0.0, 200)
+    assert (iterations, converged, cycle) == (200, False, 0)
+
+@pytest.mark.parametrize("name", sorted(OSCILLATING_MAPS))
+def test_cycle_detected_on_first_repeat(name):
+    """A period-n permutation is reported on step n, the first step that closes it."""
+    W = OSCILLATING_MAPS[name]
+    n = W.shape[0]
+    s0 = np.eye(n, dtype=np.float32)[0]
+    _, iterations, converged, cycle = _run_fcm_numpy(W, s0, NO_CLAMP_IDX, NO_CLAMP_VEC, ACTIVATION_IDS['relu'], 0.001, 100)
+    assert (iterations, converged, cycle) == (n, False, n)
+
+if __name__ == "__main__":
+    pytest.main([__file__])